@@ -0,0 +1,98 @@
+# acquisition.py
+import time
+import threading
+import numpy as np
+
+from board_manager import drain_new_samples
+from profiling import probe
+
+
+class AcquisitionThread(threading.Thread):
+    """
+    Hilo de adquisición independiente del QTimer de la GUI.
+
+    Consulta la BoardShim cada `poll_ms` milisegundos, escribe las muestras
+    nuevas en un ThreadSafeRingBuffer y acumula los mismos chunks para el
+    grabador. La GUI solo lee snapshots del buffer y llama a drain_chunks().
+    Con timestamp_channel, cada chunk conserva también el timestamp de
+    BrainFlow de su primera muestra (drain_chunks(timestamps=True)).
+
+    Contadores expuestos (ver stats()):
+      - samples_read: muestras por canal leídas desde el inicio
+      - n_polls: número de consultas a la board
+      - last/mean/max latency: duración de get_board_data (ms)
+    """
+
+    def __init__(self, board, eeg_channels, buffer, poll_ms=20, timestamp_channel=None):
+        super().__init__(name="AcquisitionThread", daemon=True)
+        self.board = board
+        self.eeg_channels = eeg_channels
+        self.timestamp_channel = timestamp_channel
+        self.buffer = buffer
+        self.poll_s = poll_ms / 1000.0
+
+        self._stop_event = threading.Event()
+        self._pending_lock = threading.Lock()
+        self._pending = []   # (chunk, timestamp) aún no consumidos por el grabador
+
+        # Contadores
+        self.samples_read = 0
+        self.n_polls = 0
+        self.last_latency_ms = 0.0
+        self.max_latency_ms = 0.0
+        self._latency_sum_ms = 0.0
+
+    def run(self):
+        while not self._stop_event.is_set():
+            t_start = time.perf_counter()
+            with probe('acquisition'):
+                if self.timestamp_channel is None:
+                    chunk = drain_new_samples(self.board, self.eeg_channels)
+                    board_ts = np.nan
+                else:
+                    chunk, ts = drain_new_samples(self.board, self.eeg_channels, self.timestamp_channel)
+                    board_ts = ts[0] if ts.size else np.nan
+                latency_ms = (time.perf_counter() - t_start) * 1000.0
+
+                if chunk.shape[1] > 0:
+                    self.buffer.extend(chunk)
+                    with self._pending_lock:
+                        self._pending.append((chunk, board_ts))
+
+            self.samples_read += chunk.shape[1]
+            self.n_polls += 1
+            self.last_latency_ms = latency_ms
+            self.max_latency_ms = max(self.max_latency_ms, latency_ms)
+            self._latency_sum_ms += latency_ms
+
+            # Esperar el resto del periodo (interrumpible por stop())
+            elapsed = time.perf_counter() - t_start
+            self._stop_event.wait(max(0.0, self.poll_s - elapsed))
+
+    def drain_chunks(self, timestamps=False):
+        """
+        Devuelve y vacía la lista de chunks (N_CH, k) pendientes de grabar.
+        Con timestamps=True devuelve pares (chunk, timestamp de BrainFlow de
+        su primera muestra, NaN si no se conoce).
+        """
+        with self._pending_lock:
+            pending, self._pending = self._pending, []
+        if timestamps:
+            return pending
+        return [chunk for chunk, _ in pending]
+
+    def stats(self):
+        """Contadores de adquisición como diccionario."""
+        return {
+            "samples_read": self.samples_read,
+            "n_polls": self.n_polls,
+            "last_latency_ms": self.last_latency_ms,
+            "mean_latency_ms": self._latency_sum_ms / max(self.n_polls, 1),
+            "max_latency_ms": self.max_latency_ms,
+        }
+
+    def stop(self, timeout=1.0):
+        """Detiene el hilo y espera a que termine."""
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
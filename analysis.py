@@ -0,0 +1,292 @@
+# analysis.py
+"""
+Análisis sin interfaz de una grabación completa (más rápido que tiempo real).
+
+Calcula la línea temporal de potencias theta/gamma por canal y del ratio
+θ/(θ+γ) cada `hop` muestras, con ventanas de win_sec, sin reproducir la
+sesión tick a tick, y con la misma definición por ventana que el motor en
+tiempo real (FeatureEngine: preprocesado y filtrado de fase cero sobre
+cada ventana).
+
+Por defecto se recorre la grabación una sola vez, por lotes de ventanas
+consecutivas (window_powers.WindowBandPowers): la cadena se aplica una vez
+a cada lote y la diferencia con la cadena por ventana, que solo depende de
+los estados de los filtros en los bordes, se suma en forma cerrada.
+Coincide con la repetición ventana a ventana hasta el redondeo. En modo
+streaming el filtrado causal se aplica una sola vez a toda la señal y las
+medias salen de sumas acumuladas, que ya es su definición.
+
+Con exact=True (--exact) se repite la cadena completa en cada ventana
+(vistas sliding_window_view procesadas por lotes con
+FeatureEngine.band_powers): mucho más lento, sirve como comprobación.
+
+    python analysis.py recordings/session_<id>.json --hop-ms 80
+"""
+import os
+import ast
+import sys
+import time
+import argparse
+from dataclasses import dataclass, field
+import numpy as np
+
+from filters import StreamingFilterBank
+from cwt import plan_frequency_grid
+from features import MODES, compute_tg_ratio, FeatureEngine
+from window_powers import get_window_powers
+from recording import open_recording
+from feature_cache import FeatureCache, CACHE_DIR
+
+SEGMENT_S = 60.0   # segmento procesado de una vez
+BATCH_MB = 256     # memoria de trabajo por lote de ventanas
+
+TIMELINE_SUFFIX = ".features.npz"
+
+DEFAULT_THETA_BAND = (4.0, 8.0)
+DEFAULT_GAMMA_BAND = (30.0, 100.0)
+
+
+@dataclass
+class FeatureTimeline:
+    """
+    Características de una sesión completa, una fila por ventana.
+
+    - t: (n_win,) fin de cada ventana (s desde el inicio de la grabación)
+    - theta_pows / gamma_pows / ratios: (n_win, N_CH) por canal
+    - ratio: (n_win,) mediana de ratios entre canales (valor de feedback)
+    - params: fs, modo, bandas, win_sec, hop, n_samples y método del análisis
+    """
+    t: np.ndarray
+    theta_pows: np.ndarray
+    gamma_pows: np.ndarray
+    ratios: np.ndarray
+    ratio: np.ndarray
+    params: dict = field(default_factory=dict)
+
+    def __len__(self):
+        return self.t.size
+
+    def save(self, path):
+        """Guarda en .npz sin comprimir (float32)."""
+        np.savez(path, t=self.t, theta_pows=self.theta_pows, gamma_pows=self.gamma_pows,
+                 ratios=self.ratios, ratio=self.ratio,
+                 params_keys=np.array(list(self.params.keys())),
+                 params_values=np.array([repr(v) for v in self.params.values()]))
+        return path
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        params = {str(k): _literal(v) for k, v in zip(data["params_keys"], data["params_values"])}
+        return cls(t=data["t"], theta_pows=data["theta_pows"], gamma_pows=data["gamma_pows"],
+                   ratios=data["ratios"], ratio=data["ratio"], params=params)
+
+    def at(self, seconds):
+        """Índice de la última ventana que termina en o antes de `seconds` (-1 si ninguna)."""
+        return int(np.searchsorted(self.t, seconds, side="right")) - 1
+
+
+def _literal(text):
+    # Los parámetros se guardan con repr (números, cadenas, tuplas)
+    return ast.literal_eval(str(text))
+
+
+def window_bounds(n_samples, win, hop):
+    """
+    (inicios, fines) de todas las ventanas completas de `win` muestras cada
+    `hop`. Los fines son múltiplos de hop, como los ticks de una reproducción
+    que avanza de hop en hop desde el inicio de la grabación.
+    """
+    ends = np.arange(-(-win // hop) * hop, n_samples + 1, hop)
+    return ends - win, ends
+
+
+class SlidingMeans:
+    """
+    Media de cada ventana [starts[i], ends[i]) a partir de segmentos
+    consecutivos (add(a, p) con p: (N_CH, k) desde la muestra a).
+
+    Solo se conservan las sumas acumuladas en los bordes de ventana, así que
+    la memoria no depende de la duración de la grabación.
+    """
+
+    def __init__(self, n_ch, starts, ends):
+        self.starts, self.ends = starts, ends
+        self.need = np.union1d(starts, ends)   # índices i de la suma acumulada (suma de x[:i])
+        self.cum = np.zeros((n_ch, self.need.size))
+        self.carry = np.zeros(n_ch)
+
+    def add(self, a, p):
+        b = a + p.shape[1]
+        # Índices en (a, b]; el 0 ya vale 0
+        lo, hi = np.searchsorted(self.need, [a, b], side="right")
+        if hi > lo:
+            local = np.cumsum(p, axis=1, dtype=np.float64)
+            self.cum[:, lo:hi] = self.carry[:, None] + local[:, self.need[lo:hi] - a - 1]
+        self.carry = self.carry + p.sum(axis=1, dtype=np.float64)
+
+    def result(self):
+        """(N_CH, n_win) medias por ventana."""
+        i0 = np.searchsorted(self.need, self.starts)
+        i1 = np.searchsorted(self.need, self.ends)
+        return (self.cum[:, i1] - self.cum[:, i0]) / (self.ends - self.starts)
+
+
+def single_pass_band_powers(reader, powers, starts, win, hop, segment_s=SEGMENT_S, progress=None):
+    """
+    Potencias por ventana (n_win, N_CH) con la definición por ventana del
+    tiempo real, en una sola pasada: cada lote de ventanas consecutivas se
+    lee como un único segmento (los lotes se solapan una ventana) y
+    `powers` (window_powers.WindowBandPowers) resuelve todas sus ventanas.
+    """
+    n_ch, n_win = reader.n_ch, starts.size
+    per_seg = max(1, int(segment_s * reader.fs) // hop)
+    batch = max(1, min(per_seg, int(BATCH_MB * 1e6 // (powers.row_bytes * n_ch))))
+    theta_pows, gamma_pows = np.empty((n_win, n_ch)), np.empty((n_win, n_ch))
+    for i in range(0, n_win, batch):
+        j = min(i + batch, n_win)
+        theta_pows[i:j], gamma_pows[i:j] = powers.batch(reader.read(starts[i], starts[j - 1] + win), hop)
+        if progress is not None:
+            progress(j / n_win)
+    return theta_pows, gamma_pows
+
+
+def exact_band_powers(reader, engine, starts, win, hop, progress=None):
+    """
+    Potencias por ventana (n_win, N_CH) repitiendo la cadena completa en
+    cada ventana: lotes de ventanas (vistas sliding_window_view, sin copiar
+    la grabación) procesadas fila a fila por FeatureEngine.band_powers.
+    Es la referencia de single_pass_band_powers (--exact).
+    """
+    n_ch, n_win = reader.n_ch, starts.size
+    per_row = win * 16 * 2 * (len(engine.band_freqs) if engine.mode == 'wavelet' else 4)
+    batch = max(1, int(BATCH_MB * 1e6 // (per_row * n_ch)))
+    theta_pows, gamma_pows = np.empty((n_win, n_ch)), np.empty((n_win, n_ch))
+    for i in range(0, n_win, batch):
+        j = min(i + batch, n_win)
+        x = reader.read(starts[i], starts[j - 1] + win)
+        views = np.lib.stride_tricks.sliding_window_view(x, win, axis=-1)[:, ::hop]
+        rows = views.transpose(1, 0, 2).reshape(-1, win)   # (lote · N_CH, win)
+        theta, gamma = engine.band_powers(rows)
+        theta_pows[i:j], gamma_pows[i:j] = theta.reshape(-1, n_ch), gamma.reshape(-1, n_ch)
+        if progress is not None:
+            progress(j / n_win)
+    return theta_pows, gamma_pows
+
+
+def causal_band_powers(reader, fs, theta_band, gamma_band, starts, ends,
+                       segment_s=SEGMENT_S, progress=None):
+    """
+    Modo streaming: la cadena causal recorre la grabación una sola vez por
+    segmentos (estado continuo entre ellos) y la media de 2·x² de cada
+    ventana sale de sumas acumuladas, igual que el motor en tiempo real.
+    """
+    n, n_ch = reader.n_samples, reader.n_ch
+    seg = int(segment_s * fs)
+    bank = StreamingFilterBank(n_ch, fs, theta_band, gamma_band, seg)
+    means = {name: SlidingMeans(n_ch, starts, ends) for name in bank.bands}
+    for a in range(0, n, seg):
+        b = min(a + seg, n)
+        out = bank.process(reader.read(a, b))
+        for name, acc in means.items():
+            acc.add(a, 2 * out[name] ** 2)
+        if progress is not None:
+            progress(b / n)
+    return means["theta"].result().T, means["gamma"].result().T
+
+
+def analyze_recording(path, hop_ms=80, win_sec=None, mode=None, theta_band=None, gamma_band=None,
+                      eps=1e-12, exact=False, segment_s=SEGMENT_S, progress=None, cache=None):
+    """
+    Línea temporal completa de una grabación (ver FeatureTimeline).
+    Por defecto usa modo, ventana y bandas guardados en la grabación.
+    exact: repite la cadena en cada ventana (comprobación lenta) en lugar
+    de la pasada única, que da el mismo resultado hasta el redondeo.
+    progress(fracción) se llama tras cada segmento o lote.
+    cache: FeatureCache opcional; si ya hay un resultado para la misma
+    grabación y parámetros se devuelve sin recalcular.
+    """
+    reader = open_recording(path)
+    meta = reader.meta
+    fs, n_ch, n = reader.fs, reader.n_ch, reader.n_samples
+    mode = mode or str(meta.get("mode", "butterworth"))
+    win_sec = win_sec or int(meta.get("win_sec", 10))
+    theta_band = tuple(theta_band or meta.get("theta_band", DEFAULT_THETA_BAND))
+    gamma_band = tuple(gamma_band or meta.get("gamma_band", DEFAULT_GAMMA_BAND))
+    win, hop = int(win_sec * fs), max(1, int(round(hop_ms * fs / 1000)))
+
+    # En streaming la pasada causal única ya es la definición del tiempo real
+    replay = exact and mode != 'streaming'
+    params = {"fs": fs, "n_ch": n_ch, "mode": mode, "win_sec": win_sec, "hop": hop,
+              "theta_band": theta_band, "gamma_band": gamma_band, "n_samples": n,
+              "method": "replay" if replay else "single-pass"}
+    if cache is not None:
+        key = cache.key(reader, dict(params, eps=eps, segment_s=segment_s,
+                                     freqs=plan_frequency_grid(fs, {"theta": theta_band,
+                                                                    "gamma": gamma_band})[0]))
+        timeline = cache.get(key)
+        if timeline is not None:
+            return timeline
+
+    starts, ends = window_bounds(n, win, hop)
+    if mode == 'streaming':
+        theta_pows, gamma_pows = causal_band_powers(reader, fs, theta_band, gamma_band,
+                                                    starts, ends, segment_s, progress)
+    elif replay:
+        engine = FeatureEngine(fs, n_ch, win_sec, theta_band, gamma_band, mode=mode, eps=eps, sliding=False)
+        theta_pows, gamma_pows = exact_band_powers(reader, engine, starts, win, hop, progress)
+    else:
+        powers = get_window_powers(fs, win, theta_band, gamma_band, mode)
+        theta_pows, gamma_pows = single_pass_band_powers(reader, powers, starts, win, hop,
+                                                         segment_s, progress)
+
+    ratios = compute_tg_ratio(theta_pows, gamma_pows, eps)
+    timeline = FeatureTimeline(t=ends / fs, theta_pows=theta_pows.astype(np.float32),
+                               gamma_pows=gamma_pows.astype(np.float32),
+                               ratios=ratios.astype(np.float32),
+                               ratio=np.median(ratios, axis=1).astype(np.float32), params=params)
+    if cache is not None:
+        cache.put(key, timeline)
+    return timeline
+
+
+def timeline_path(path):
+    """Ruta por defecto del resultado: <base>.features.npz junto a la grabación."""
+    return os.path.splitext(path)[0] + TIMELINE_SUFFIX
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Línea temporal θ/γ de una grabación, sin interfaz.")
+    p.add_argument("recording", help="grabación .json/.raw (o .npz antiguo)")
+    p.add_argument("--hop-ms", type=float, default=80)
+    p.add_argument("--win-sec", type=int, default=None, help="por defecto, el de la sesión")
+    p.add_argument("--mode", choices=MODES, default=None, help="por defecto, el de la sesión")
+    p.add_argument("--exact", action="store_true",
+                   help="repetir la cadena en cada ventana (comprobación lenta de la pasada única)")
+    p.add_argument("--out", default=None, help="por defecto <base>.features.npz")
+    p.add_argument("--cache-dir", default=CACHE_DIR, help="caché de características en disco")
+    p.add_argument("--no-cache", action="store_true", help="recalcular sin usar ni llenar la caché")
+    args = p.parse_args(argv)
+
+    cache = None if args.no_cache else FeatureCache(args.cache_dir)
+    t0 = time.perf_counter()
+    timeline = analyze_recording(args.recording, hop_ms=args.hop_ms, win_sec=args.win_sec,
+                                 mode=args.mode, exact=args.exact, cache=cache)
+    elapsed = time.perf_counter() - t0
+    if cache is not None and cache.hits:
+        print(f"[INFO] Resultado tomado de la caché ({cache.root})")
+    out = timeline.save(args.out or timeline_path(args.recording))
+
+    prm = timeline.params
+    duration = prm["n_samples"] / prm["fs"]
+    print(f"[INFO] {len(timeline)} ventanas ({prm['mode']} {prm['method']}, {prm['win_sec']} s, hop {prm['hop']} muestras) "
+          f"de {duration:.0f} s en {elapsed:.1f} s ({duration / max(elapsed, 1e-9):.0f}x tiempo real)")
+    if len(timeline):
+        print(f"[INFO] Ratio: mediana {np.median(timeline.ratio):.3f}, "
+              f"rango {timeline.ratio.min():.3f}–{timeline.ratio.max():.3f}")
+    print(f"[INFO] Resultado guardado en {out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,194 @@
+# batch.py
+"""
+Análisis por lotes de muchas grabaciones en paralelo (un proceso por archivo).
+
+Cada grabación se analiza con analysis.analyze_recording, con la misma
+definición por ventana que el motor en tiempo real y la reproducción
+offline, en una sola pasada (--exact repite la cadena en cada ventana,
+mucho más lento; esas filas quedan marcadas con method=replay en la
+tabla). Se guarda su línea temporal (<base>.features.npz) y se añade una
+fila a una tabla resumen CSV. La tabla se escribe a medida que terminan
+los archivos, así que al relanzar el comando (reanudación) se omiten los
+ya procesados con los mismos parámetros y sin cambios en disco.
+
+    python batch.py recordings --workers 4 --summary recordings/summary.csv
+"""
+import os
+import csv
+import sys
+import glob
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing as mp
+import numpy as np
+
+from analysis import analyze_recording, timeline_path, TIMELINE_SUFFIX
+from features import MODES
+from recording import recording_paths, is_raw_recording
+from feature_cache import FeatureCache, CACHE_DIR
+
+SUMMARY_FIELDS = ["recording", "size", "mtime_ns", "hop_ms", "mode", "method",
+                  "fs", "n_ch", "win_sec", "duration_s", "n_windows",
+                  "ratio_median", "ratio_mean", "ratio_p10", "ratio_p90",
+                  "theta_mean", "gamma_mean", "features", "elapsed_s"]
+
+
+def find_recordings(inputs):
+    """
+    Grabaciones de una lista de archivos, directorios o patrones glob.
+    Una sesión convertida (.npz + .json/.raw) se cuenta una sola vez.
+    """
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths += glob.glob(os.path.join(item, "session_*.json"))
+            paths += glob.glob(os.path.join(item, "session_*.npz"))
+        else:
+            paths += glob.glob(item)
+    found = {}
+    for path in sorted(paths):
+        if path.endswith(TIMELINE_SUFFIX) or (path.endswith(".json") and not is_raw_recording(path)):
+            continue
+        base = os.path.splitext(path)[0]
+        # Un .npz convertido se sigue identificando por el .npz (clave estable
+        # para reanudar); open_recording usa su .json/.raw
+        if base not in found or path.endswith(".npz"):
+            found[base] = path
+    return [found[b] for b in sorted(found)]
+
+
+def source_stat(path):
+    """(tamaño, mtime_ns) de los datos de una grabación, para detectar cambios."""
+    data = path if path.endswith(".npz") else recording_paths(path)[1]
+    st = os.stat(data)
+    return st.st_size, st.st_mtime_ns
+
+
+def read_summary(path):
+    """Filas ya presentes en la tabla resumen {recording: fila}."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, newline="") as f:
+        return {row["recording"]: row for row in csv.DictReader(f)}
+
+
+def method_name(exact):
+    """Etiqueta del método pedido en la tabla: 'replay' o 'single-pass'."""
+    return "replay" if exact else "single-pass"
+
+
+def is_done(row, path, hop_ms, mode, exact):
+    """True si la fila corresponde al archivo actual con los mismos parámetros."""
+    if row is None:
+        return False
+    try:
+        size, mtime_ns = source_stat(path)
+    except OSError:
+        return False   # el error se informa al procesarlo
+    return (int(row["size"]) == size and int(row["mtime_ns"]) == mtime_ns
+            and float(row["hop_ms"]) == float(hop_ms) and row["mode"] == (mode or "")
+            and row.get("method") == method_name(exact) and os.path.exists(row["features"]))
+
+
+def process_one(path, hop_ms, mode, exact, cache_dir=None):
+    """Analiza una grabación (en un proceso del pool) y devuelve su fila resumen."""
+    t0 = time.perf_counter()
+    size, mtime_ns = source_stat(path)
+    cache = FeatureCache(cache_dir) if cache_dir else None
+    timeline = analyze_recording(path, hop_ms=hop_ms, mode=mode, exact=exact, cache=cache)
+    features = timeline.save(timeline_path(path))
+    prm, ratio = timeline.params, timeline.ratio
+    p10, p90 = np.percentile(ratio, [10, 90]) if len(timeline) else (np.nan, np.nan)
+    return {
+        "recording": path, "size": size, "mtime_ns": mtime_ns,
+        "hop_ms": hop_ms, "mode": mode or "", "method": method_name(exact),
+        "fs": prm["fs"], "n_ch": prm["n_ch"], "win_sec": prm["win_sec"],
+        "duration_s": prm["n_samples"] / prm["fs"], "n_windows": len(timeline),
+        "ratio_median": float(np.median(ratio)) if len(timeline) else np.nan,
+        "ratio_mean": float(ratio.mean()) if len(timeline) else np.nan,
+        "ratio_p10": float(p10), "ratio_p90": float(p90),
+        "theta_mean": float(timeline.theta_pows.mean()) if len(timeline) else np.nan,
+        "gamma_mean": float(timeline.gamma_pows.mean()) if len(timeline) else np.nan,
+        "features": features, "elapsed_s": time.perf_counter() - t0,
+    }
+
+
+def write_summary(path, rows):
+    """Reescribe la tabla completa de forma atómica."""
+    tmp = path + ".tmp"
+    with open(tmp, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for key in sorted(rows):
+            writer.writerow(rows[key])
+    os.replace(tmp, path)
+
+
+def run_batch(inputs, summary, workers=None, hop_ms=80, mode=None, exact=False, resume=True,
+              cache_dir=CACHE_DIR):
+    """
+    Procesa las grabaciones de `inputs` en un pool de procesos y mantiene la
+    tabla `summary`. Devuelve (procesadas, omitidas, fallidas).
+    cache_dir: caché de características compartida (None para desactivarla).
+    """
+    paths = find_recordings(inputs)
+    rows = read_summary(summary) if resume else {}
+    todo = [p for p in paths if not (resume and is_done(rows.get(p), p, hop_ms, mode, exact))]
+    skipped = len(paths) - len(todo)
+    print(f"[INFO] {len(paths)} grabaciones: {len(todo)} por procesar, {skipped} ya procesadas.")
+
+    done, failed = 0, 0
+    if todo:
+        # 'spawn' como en compute_worker: procesos limpios en todas las plataformas
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as pool:
+            futures = {pool.submit(process_one, p, hop_ms, mode, exact, cache_dir): p for p in todo}
+            for i, fut in enumerate(as_completed(futures), 1):
+                path = futures[fut]
+                try:
+                    row = fut.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"[ERROR] [{i}/{len(todo)}] {path}: {e}")
+                    continue
+                done += 1
+                rows[path] = row
+                write_summary(summary, rows)
+                print(f"[INFO] [{i}/{len(todo)}] {os.path.basename(path)}: "
+                      f"{row['duration_s']:.0f} s en {row['elapsed_s']:.1f} s, "
+                      f"ratio mediano {row['ratio_median']:.3f}")
+    elif rows:
+        write_summary(summary, rows)
+    return done, skipped, failed
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Análisis θ/γ por lotes de grabaciones, en paralelo.")
+    p.add_argument("inputs", nargs="+", help="directorios, archivos o patrones (session_*.json/.npz)")
+    p.add_argument("--summary", default=None, help="tabla CSV (por defecto <primer directorio>/summary.csv)")
+    p.add_argument("--workers", type=int, default=None, help="procesos (por defecto, núcleos disponibles)")
+    p.add_argument("--hop-ms", type=float, default=80)
+    p.add_argument("--mode", choices=MODES, default=None, help="por defecto, el de cada sesión")
+    p.add_argument("--exact", action="store_true",
+                   help="repetir la cadena en cada ventana (ver analysis.py --exact); filas con method=replay")
+    p.add_argument("--no-resume", action="store_true", help="reprocesar todo")
+    p.add_argument("--cache-dir", default=CACHE_DIR, help="caché de características en disco")
+    p.add_argument("--no-cache", action="store_true", help="no usar la caché de características")
+    args = p.parse_args(argv)
+
+    summary = args.summary
+    if summary is None:
+        first = args.inputs[0]
+        summary = os.path.join(first if os.path.isdir(first) else os.path.dirname(first) or ".", "summary.csv")
+
+    t0 = time.perf_counter()
+    done, skipped, failed = run_batch(args.inputs, summary, args.workers, args.hop_ms,
+                                      args.mode, args.exact, resume=not args.no_resume,
+                                      cache_dir=None if args.no_cache else args.cache_dir)
+    print(f"[INFO] {done} procesadas, {skipped} omitidas, {failed} con error "
+          f"en {time.perf_counter() - t0:.1f} s → {summary}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,5 @@
 # board_manager.py
 import numpy as np
-from brainflow.board_shim import BoardShim, BrainFlowInputParams, BoardIds
 
 
 def init_board(use_synthetic=True, serial_port="COM4"):
@@ -9,6 +8,10 @@ def init_board(use_synthetic=True, serial_port="COM4"):
       - use_synthetic=True → usa señal artificial (Synthetic Board).
       - use_synthetic=False → usa Cyton conectado por el puerto serial.
     """
+    # Importación diferida: el resto del módulo (drenado de muestras) no
+    # necesita BrainFlow, así que latency_harness corre sin él
+    from brainflow.board_shim import BoardShim, BrainFlowInputParams, BoardIds
+
     BoardShim.enable_dev_board_logger()
     params = BrainFlowInputParams()
 
@@ -42,3 +45,24 @@ def get_eeg_channels(board, N_CH):
         eeg_channels = (eeg_channels * times)[:N_CH]
         print(f"[WARN] La board tiene menos canales, se repitieron para llegar a {N_CH}.")
         return eeg_channels
+
+
+def get_timestamp_channel(board):
+    """Fila de timestamps (s, reloj de BrainFlow) en los datos de la board."""
+    return board.get_timestamp_channel(board.get_board_id())
+
+
+def drain_new_samples(board, eeg_channels, timestamp_channel=None):
+    """
+    Extrae de la board solo las muestras nuevas desde la última lectura.
+
+    A diferencia de get_current_board_data (que re-lee la ventana completa),
+    get_board_data vacía el buffer interno de BrainFlow, por lo que el coste
+    escala con las muestras nuevas y no con el largo de la ventana.
+    Devuelve un array (N_CH, n_nuevas); con timestamp_channel devuelve
+    (array, timestamps (n_nuevas,)).
+    """
+    data = board.get_board_data()
+    if timestamp_channel is None:
+        return data[eeg_channels]
+    return data[eeg_channels], data[timestamp_channel]
@@ -0,0 +1,175 @@
+# compute_worker.py
+import time
+import queue
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+
+from ring_buffer import ThreadSafeRingBuffer
+from features import FeatureEngine
+from profiling import STAGES
+from scheduler import AdaptiveScheduler
+
+# Se usa 'spawn' en todas las plataformas: el proceso hijo no hereda Qt ni hilos
+MP_CONTEXT = mp.get_context("spawn")
+
+_HEADER_BYTES = 16   # [head, total_written] como int64
+
+
+class SharedRingBuffer(ThreadSafeRingBuffer):
+    """
+    ThreadSafeRingBuffer en memoria compartida (multiprocessing.shared_memory).
+
+    La cabeza y total_written viven en el mismo bloque que los datos, así
+    que el proceso de cómputo ve exactamente el estado que escribe el hilo
+    de adquisición. El lock debe ser de multiprocessing. Al pasarse a un
+    proceso hijo se reabre por nombre (ver __reduce__).
+    """
+
+    def __init__(self, n_ch, capacity, dtype=np.float64, lock=None, name=None):
+        self.n_ch = int(n_ch)
+        self.capacity = int(capacity)
+        self.dtype = np.dtype(dtype)
+        self.lock = lock if lock is not None else MP_CONTEXT.RLock()
+
+        nbytes = _HEADER_BYTES + self.n_ch * 2 * self.capacity * self.dtype.itemsize
+        self._owner = name is None
+        self._shm = shared_memory.SharedMemory(name=name, create=self._owner, size=nbytes)
+        self._header = np.ndarray((2,), dtype=np.int64, buffer=self._shm.buf)
+        self._data = np.ndarray((self.n_ch, 2 * self.capacity), dtype=self.dtype,
+                                buffer=self._shm.buf, offset=_HEADER_BYTES)
+        if self._owner:
+            self._header[:] = 0
+            self._data.fill(0)
+
+    # Cabeza y contador compartidos entre procesos
+    @property
+    def _head(self):
+        return int(self._header[0])
+
+    @_head.setter
+    def _head(self, value):
+        self._header[0] = value
+
+    @property
+    def total_written(self):
+        return int(self._header[1])
+
+    @total_written.setter
+    def total_written(self, value):
+        self._header[1] = value
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def __reduce__(self):
+        return (SharedRingBuffer, (self.n_ch, self.capacity, self.dtype, self.lock, self.name))
+
+    def close(self):
+        """Libera las vistas y el bloque (lo elimina si este proceso lo creó)."""
+        self._header = self._data = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+def _publish(frames, frame):
+    # Cola acotada: si la GUI va atrasada se descarta el frame más antiguo
+    try:
+        frames.put_nowait(frame)
+    except queue.Full:
+        try:
+            frames.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            frames.put_nowait(frame)
+        except queue.Full:
+            pass
+
+
+def _worker_main(buffer, engine_kwargs, control, frames, stop_event, poll_s,
+                 min_new=1, profile_path=None):
+    """Bucle del proceso de cómputo: snapshot → FeatureEngine → cola de frames."""
+    STAGES.enabled = profile_path is not None
+    engine = FeatureEngine(**engine_kwargs)
+    sched = AdaptiveScheduler(engine.fs, min_new, poll_ms=poll_s * 1000.0)
+    last_req = None
+    try:
+        while not stop_event.is_set():
+            req = (int(control[0]), bool(control[1]))   # (canal, espectrograma)
+            # Un cambio de canal o de espectrograma se atiende sin esperar al hop
+            if not sched.due(buffer.total_written) and req == last_req:
+                stop_event.wait(poll_s)
+                continue
+            window, total = buffer.snapshot(engine.win_samples)
+            with sched.running(total):
+                frame = engine.process(window, total, ch_sel=req[0], want_spec=req[1])
+            _publish(frames, frame)
+            last_req = req
+    finally:
+        # Los frames que la GUI ya no leerá no deben impedir que el proceso termine
+        frames.cancel_join_thread()
+        engine.close()
+        buffer.close()
+        if profile_path is not None:
+            STAGES.export(profile_path)
+
+
+class ComputeWorker:
+    """
+    Proceso de cómputo opcional: lee ventanas del SharedRingBuffer, ejecuta
+    FeatureEngine y publica FeatureFrame por una cola acotada. La GUI solo
+    renderiza (usa otro núcleo y evita competir por el GIL).
+
+    - buffer: SharedRingBuffer que escribe el hilo de adquisición
+    - engine_kwargs: argumentos de FeatureEngine
+    - poll_ms: espera cuando no hay muestras nuevas
+    - min_new: muestras nuevas mínimas por cómputo (AdaptiveScheduler)
+    - profile_path: si se indica, el proceso mide sus etapas (profiling) y
+      las exporta a ese archivo al terminar
+    """
+
+    def __init__(self, buffer, engine_kwargs, poll_ms=5, min_new=1, profile_path=None):
+        self.control = MP_CONTEXT.Array('i', [0, 1])   # [canal seleccionado, espectrograma]
+        self.frames = MP_CONTEXT.Queue(maxsize=2)
+        self._stop_event = MP_CONTEXT.Event()
+        self.frames_received = 0
+        self.process = MP_CONTEXT.Process(
+            target=_worker_main, name="ComputeWorker", daemon=True,
+            args=(buffer, engine_kwargs, self.control, self.frames,
+                  self._stop_event, poll_ms / 1000.0, min_new, profile_path))
+
+    def start(self):
+        self.process.start()
+
+    @property
+    def alive(self):
+        return self.process.is_alive()
+
+    def set_request(self, ch_sel, want_spec):
+        """Canal seleccionado y visibilidad del espectrograma para los próximos frames."""
+        self.control[0] = int(ch_sel)
+        self.control[1] = int(bool(want_spec))
+
+    def latest_frame(self):
+        """Vacía la cola y devuelve el FeatureFrame más reciente (o None)."""
+        frame = None
+        while True:
+            try:
+                frame = self.frames.get_nowait()
+            except queue.Empty:
+                return frame
+            self.frames_received += 1
+
+    def stop(self, timeout=2.0):
+        self._stop_event.set()
+        # Vaciar la cola mientras se espera: el hilo alimentador del hijo no
+        # termina hasta entregar sus frames
+        deadline = time.monotonic() + timeout
+        while self.process.is_alive() and time.monotonic() < deadline:
+            self.latest_frame()
+            self.process.join(0.02)
+        if self.process.is_alive():
+            self.process.terminate()
@@ -0,0 +1,204 @@
+# cwt.py
+from functools import lru_cache
+import numpy as np
+import pywt
+from scipy.fft import rfft, ifft, next_fast_len
+from scipy.signal import fftconvolve
+
+# Máximo de motores (fs, n, freqs, wavelet) distintos en caché
+CWT_CACHE_SIZE = 8
+
+
+def plan_frequency_grid(fs, bands, n_per_band=8, spacing='log', nyq_margin=0.9):
+    """
+    Planifica la rejilla de frecuencias de la CWT a partir de las bandas
+    realmente usadas, en lugar de una rejilla fija (p. ej. 1–100 Hz).
+
+    - bands: dict {nombre: (f_low, f_high)}
+    - n_per_band: frecuencias por banda
+    - spacing: 'log' (geométrica, resolución constante en Q) o 'linear'
+    - nyq_margin: las frecuencias se recortan a nyq_margin · fs/2
+
+    Devuelve (freqs, masks): freqs ordenadas y sin duplicados, y
+    masks {nombre: máscara booleana sobre freqs}. Una banda que queda
+    por encima de Nyquist devuelve una máscara vacía.
+    """
+    f_max = nyq_margin * fs / 2
+    grids = {}
+    for name, (low, high) in bands.items():
+        high = min(high, f_max)
+        if low >= high:
+            print(f"[WARN] Banda '{name}' ({low}-{high} Hz) por encima de Nyquist, se omite.")
+            grids[name] = np.array([])
+            continue
+        if spacing == 'log':
+            grids[name] = np.geomspace(low, high, n_per_band)
+        else:
+            grids[name] = np.linspace(low, high, n_per_band)
+
+    freqs = np.unique(np.concatenate(list(grids.values())))
+    masks = {name: np.isin(freqs, g) for name, g in grids.items()}
+    return freqs, masks
+
+
+class MorletCWT:
+    """
+    Motor CWT en el dominio de la frecuencia con núcleos precalculados.
+
+    Reproduce numéricamente pywt.cwt (método 'conv'): para cada escala se
+    usa el mismo núcleo de wavelet integrada, con la derivada (np.diff), el
+    factor -sqrt(escala) y el recorte central incorporados en el espectro
+    del núcleo. Así todas las escalas y todos los canales se calculan con
+    una rFFT por lotes, un producto con broadcasting y una iFFT por lotes.
+
+    - fs: frecuencia de muestreo
+    - n_times: largo de la ventana (muestras)
+    - freqs: frecuencias (Hz) de cada fila de salida
+    """
+
+    def __init__(self, fs, n_times, freqs, wavelet='cmor1.5-1.0', precision=12):
+        self.fs = fs
+        self.n_times = int(n_times)
+        self.freqs = np.asarray(freqs, dtype=float)
+        self.scales = pywt.central_frequency(wavelet) * fs / self.freqs
+
+        # precision=12: mismo valor por defecto que pywt.cwt
+        wav = pywt.ContinuousWavelet(wavelet)
+        int_psi, x = pywt.integrate_wavelet(wav, precision=precision)
+        int_psi = np.conj(int_psi) if wav.complex_cwt else int_psi
+        step = x[1] - x[0]
+
+        # Núcleos en el tiempo (igual que pywt.cwt) con la derivada incluida
+        kernels, starts = [], []
+        for scale in self.scales:
+            j = (np.arange(scale * (x[-1] - x[0]) + 1) / (scale * step)).astype(int)
+            j = j[j < int_psi.size]
+            k = int_psi[j][::-1]
+            d = (k.size - 2) / 2.0
+            if d < 0:
+                raise ValueError(f"Escala {scale:.3f} demasiado pequeña para la CWT.")
+            # diff(x * k) == (x * k')[1:], con k' = diff([0, k, 0])
+            kernels.append(-np.sqrt(scale) * np.diff(np.concatenate(([0], k, [0]))))
+            starts.append(1 + int(np.floor(d)))
+
+        self.kernels = kernels   # núcleos en el tiempo (para la CWT deslizante)
+        self.starts = starts     # índice de la salida recortada en la conv. completa
+
+        max_len = max(k.size for k in kernels)
+        self.nfft = next_fast_len(self.n_times + max_len)
+
+        # Espectros de los núcleos, desplazados circularmente para que la
+        # salida recortada empiece en el índice 0
+        bins = np.arange(self.nfft)
+        self._kernels_f = np.empty((len(kernels), self.nfft), dtype=complex)
+        for i, (k, start) in enumerate(zip(kernels, starts)):
+            shift = np.exp(2j * np.pi * bins * start / self.nfft)
+            self._kernels_f[i] = np.fft.fft(k, self.nfft) * shift
+
+    def _full_spectrum(self, x):
+        # rFFT de la señal real y reconstrucción hermítica del espectro completo
+        xr = rfft(x, self.nfft, axis=-1)
+        n_neg = self.nfft - xr.shape[-1]
+        neg = np.conj(xr[..., 1:n_neg + 1][..., ::-1])
+        return np.concatenate((xr, neg), axis=-1)
+
+    def coefficients(self, x):
+        """
+        Coeficientes complejos de la CWT.
+        x: (n_times,) o (N_CH, n_times) → (n_freqs, n_times) o (N_CH, n_freqs, n_times).
+        """
+        x = np.asarray(x, dtype=float)
+        spec = self._full_spectrum(x)[..., None, :] * self._kernels_f
+        return ifft(spec, axis=-1)[..., :self.n_times]
+
+    def power(self, x):
+        """Potencia normalizada por escala, igual que compute_wavelet (µV²)."""
+        coeffs = self.coefficients(x)
+        power = coeffs.real ** 2 + coeffs.imag ** 2
+        return power / (self.scales[:, None] + 1e-18)
+
+
+@lru_cache(maxsize=CWT_CACHE_SIZE)
+def _cached_engine(fs, n_times, freqs, wavelet):
+    return MorletCWT(fs, n_times, np.array(freqs), wavelet=wavelet)
+
+
+def get_cwt_engine(fs, n_times, freqs, wavelet='cmor1.5-1.0'):
+    """Devuelve el motor CWT cacheado para (fs, n_times, freqs, wavelet)."""
+    return _cached_engine(fs, int(n_times), tuple(np.asarray(freqs, dtype=float)), wavelet)
+
+
+class SlidingCWT:
+    """
+    CWT incremental: conserva la matriz de potencia anterior y solo
+    recalcula las columnas afectadas por las muestras nuevas.
+
+    Con un salto de k muestras, la columna t depende de muestras hasta
+    t + alcance_derecho(escala); solo las columnas t >= n - k - alcance se
+    recalculan (por escala, con el soporte efectivo del núcleo truncado a
+    `tol` de su amplitud máxima) y el resto se desplaza k columnas. El coste
+    escala con el salto y no con el largo de la ventana.
+
+    La primera llamada (o un salto >= ventana) usa la CWT completa exacta.
+
+    Las muestras ya vistas no deben cambiar entre llamadas: la entrada tiene
+    que venir de un preprocesado causal con estado (CausalPreprocessor), no
+    de filtfilt sobre cada ventana, que modifica toda la ventana en cada tick
+    y dejaría columnas desfasadas respecto de la CWT completa.
+    """
+
+    def __init__(self, fs, n_times, freqs, wavelet='cmor1.5-1.0', tol=1e-4):
+        self.engine = get_cwt_engine(fs, n_times, freqs, wavelet)
+        self.n_times = self.engine.n_times
+        self.freqs = self.engine.freqs
+
+        # Soporte efectivo de cada núcleo: índices [lo, hi] con |k| > tol·max|k|
+        self._support = []
+        for k, start in zip(self.engine.kernels, self.engine.starts):
+            idx = np.flatnonzero(np.abs(k) > tol * np.abs(k).max())
+            lo, hi = int(idx[0]), int(idx[-1])
+            self._support.append((k[lo:hi + 1], lo, hi, start))
+
+        self.power = None        # (N_CH, n_freqs, n_times)
+        self.samples_seen = 0    # total_written ya incorporado
+        self.key = None          # identifica los canales del estado actual
+
+    def reset(self):
+        self.power = None
+        self.samples_seen = 0
+        self.key = None
+
+    def update(self, window, total_written, key=None):
+        """
+        window: ventana actual (N_CH, n_times) ya preprocesada.
+        total_written: contador de muestras del buffer (RingBuffer.total_written).
+        key: identifica qué canales contiene window (p. ej. el canal
+             seleccionado); si cambia, se recalcula la ventana completa.
+        Devuelve la potencia normalizada (N_CH, n_freqs, n_times).
+        """
+        window = np.asarray(window, dtype=float)
+        n = self.n_times
+        n_new = total_written - self.samples_seen
+        self.samples_seen = total_written
+        stale = key != self.key
+        self.key = key
+
+        if self.power is None or stale or self.power.shape[0] != window.shape[0] or n_new >= n:
+            self.power = self.engine.power(window)
+            return self.power
+        if n_new <= 0:
+            return self.power
+
+        # Desplazar las columnas ya calculadas
+        self.power[..., :n - n_new] = self.power[..., n_new:]
+
+        for f, (kt, lo, hi, start) in enumerate(self._support):
+            # Columnas cuyo soporte alcanza alguna muestra nueva
+            a = max(0, n - n_new - (start - lo))
+            i0 = max(0, a + start - hi)
+            full = fftconvolve(window[:, i0:], kt[None, :], axes=-1)
+            j0 = start - lo - i0 + a
+            coeffs = full[:, j0:j0 + (n - a)]
+            self.power[:, f, a:] = (coeffs.real ** 2 + coeffs.imag ** 2) / (self.engine.scales[f] + 1e-18)
+        return self.power
+
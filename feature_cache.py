@@ -0,0 +1,180 @@
+# feature_cache.py
+"""
+Caché en disco de líneas temporales de características (FeatureTimeline).
+
+Direccionada por contenido: la clave combina el checksum de las muestras
+de la grabación con todos los parámetros del análisis (fs, bandas, modo,
+ventana, hop, rejilla de frecuencias) y la versión del código que define
+las características, así que un resultado nunca se reutiliza si cambia
+cualquiera de ellos. El tamaño total está acotado; al superarlo se borran
+las entradas usadas hace más tiempo (LRU por mtime, que se actualiza en
+cada acierto).
+
+    cache = FeatureCache()
+    timeline = analyze_recording(path, cache=cache)   # 2.ª vez: instantáneo
+"""
+import os
+import json
+import hashlib
+import numpy as np
+
+CACHE_DIR = os.path.join("recordings", ".feature_cache")
+CACHE_MAX_MB = 1024
+# Módulos que definen las características: cualquier cambio invalida la caché
+CODE_MODULES = ("filters", "cwt", "features", "window_powers", "analysis")
+HASH_BLOCK = 1 << 22
+
+_code_version = None
+
+
+def code_version():
+    """Huella del código fuente de CODE_MODULES (calculada una vez por proceso)."""
+    global _code_version
+    if _code_version is None:
+        h = hashlib.blake2b(digest_size=8)
+        here = os.path.dirname(os.path.abspath(__file__))
+        for name in CODE_MODULES:
+            with open(os.path.join(here, name + ".py"), "rb") as f:
+                h.update(f.read())
+        _code_version = h.hexdigest()
+    return _code_version
+
+
+def recording_checksum(reader):
+    """Checksum de las muestras (.raw) y de su codificación, leído por bloques."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps([reader.fs, reader.n_ch, reader.codec.header()], sort_keys=True).encode())
+    with open(reader.raw_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _jsonable(value):
+    if isinstance(value, np.ndarray):
+        return [round(float(v), 6) for v in value]
+    if isinstance(value, (tuple, list)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, (np.integer, np.floating)):
+        return value.item()
+    return value
+
+
+class FeatureCache:
+    """
+    Directorio de entradas <clave>.npz (FeatureTimeline.save) más un
+    registro de checksums por (ruta, tamaño, mtime) para no releer el .raw
+    al reabrir una grabación que no ha cambiado.
+    """
+
+    def __init__(self, root=CACHE_DIR, max_mb=CACHE_MAX_MB):
+        self.root = root
+        self.max_bytes = int(max_mb * 1e6)
+        self.checksums_path = os.path.join(root, "checksums.json")
+        os.makedirs(root, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    # ---- claves ----
+    def checksum(self, reader):
+        """Checksum de la grabación, reutilizado mientras el .raw no cambie."""
+        st = os.stat(reader.raw_path)
+        path = os.path.realpath(reader.raw_path)
+        known = self._read_checksums()
+        entry = known.get(path)
+        if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            return entry["checksum"]
+        checksum = recording_checksum(reader)
+        known[path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "checksum": checksum}
+        self._write_json(self.checksums_path, known)
+        return checksum
+
+    def key(self, reader, params):
+        """Clave de una grabación + parámetros de análisis (dict serializable)."""
+        payload = {"recording": self.checksum(reader), "code": code_version(),
+                   "params": {k: _jsonable(v) for k, v in params.items()}}
+        text = json.dumps(payload, sort_keys=True)
+        return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.root, key + ".npz")
+
+    # ---- acceso ----
+    def get(self, key):
+        """FeatureTimeline guardada o None. Un acierto la marca como usada."""
+        from analysis import FeatureTimeline
+        path = self.path(key)
+        try:
+            timeline = FeatureTimeline.load(path)
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            # Ausente, o borrada/truncada por otro proceso
+            self.misses += 1
+            return None
+        self.hits += 1
+        return timeline
+
+    def put(self, key, timeline):
+        """Guarda de forma atómica y aplica el límite de tamaño."""
+        path = self.path(key)
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        timeline.save(tmp)
+        os.replace(tmp, path)
+        self.evict()
+        return path
+
+    def entries(self):
+        """[(mtime, tamaño, ruta)] de las entradas, de la menos a la más reciente."""
+        out = []
+        for name in os.listdir(self.root):
+            if not name.endswith(".npz") or ".tmp" in name:
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            out.append((st.st_mtime, st.st_size, path))
+        return sorted(out)
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """Borra las entradas menos usadas hasta quedar bajo max_bytes. Devuelve cuántas."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self):
+        for _, _, path in self.entries():
+            os.remove(path)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses,
+                "entries": len(self.entries()), "size_mb": self.size() / 1e6}
+
+    # ---- auxiliares ----
+    def _read_checksums(self):
+        try:
+            with open(self.checksums_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _write_json(path, data):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
@@ -0,0 +1,308 @@
+# features.py
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from filters import (bandpass_sos, preprocess_signal, bandpass_gain_factor, envelope,
+                     StreamingFilterBank, CausalPreprocessor)
+from cwt import get_cwt_engine, plan_frequency_grid, SlidingCWT
+from profiling import probe
+
+MODES = ("butterworth", "wavelet", "streaming")
+
+
+# =========================
+# Wavelet transform
+# =========================
+def compute_wavelet(raw_win, fs, freqs, wavelet='cmor1.5-1.0'):
+    """
+    Continuous Wavelet Transform (CWT) usando Morlet compleja.
+    Usa el motor FFT con núcleos cacheados (cwt.MorletCWT), numéricamente
+    equivalente a pywt.cwt. raw_win puede ser (n_times,) o (N_CH, n_times).
+    Devuelve matriz de potencia normalizada (n_freqs, n_times) o
+    (N_CH, n_freqs, n_times) en µV².
+    """
+    engine = get_cwt_engine(fs, raw_win.shape[-1], freqs, wavelet)
+    return engine.power(raw_win)
+
+
+def cwt_power(raw, fs, freqs, total_written=None, cwt=None, key=None):
+    """
+    CWT bajo demanda: usa el SlidingCWT si existe (incremental) o la CWT
+    completa en caso contrario. raw: (N_CH, n_times) ya preprocesado.
+    """
+    if cwt is not None and total_written is not None:
+        return cwt.update(raw, total_written, key=key)
+    return compute_wavelet(raw, fs, freqs)
+
+
+# =========================
+# Theta/Gamma Ratio
+# =========================
+def compute_tg_ratio(theta_power, gamma_power, eps=1e-12):
+    """
+    Calcula el ratio normalizado Theta/Gamma en [0,1]:
+        ratio = Pθ / (Pθ + Pγ + eps)
+    """
+    return theta_power / (theta_power + gamma_power + eps)
+
+
+def channel_blocks(n_ch, n_blocks):
+    """Divide range(n_ch) en n_blocks bloques contiguos (slices) de tamaño similar."""
+    n_blocks = max(1, min(int(n_blocks), n_ch))
+    edges = np.linspace(0, n_ch, n_blocks + 1).astype(int)
+    return [slice(a, b) for a, b in zip(edges[:-1], edges[1:])]
+
+
+# =========================
+# Resultado de un tick
+# =========================
+@dataclass
+class FeatureFrame:
+    """
+    Resultado compacto de FeatureEngine.process (solo arrays, sin Qt).
+
+    - theta_pows / gamma_pows / ratios: (N_CH,) por canal
+    - ratio: mediana de ratios entre canales (valor de feedback)
+    - theta_trace / gamma_trace: (n,) del canal seleccionado; señal filtrada
+      (butterworth, streaming) o envolvente wavelet (wavelet)
+    - spec: (n_freqs, n) potencia CWT del canal seleccionado, o None
+    """
+    mode: str
+    ch_sel: int
+    theta_pows: np.ndarray
+    gamma_pows: np.ndarray
+    ratios: np.ndarray
+    ratio: float
+    theta_trace: np.ndarray
+    gamma_trace: np.ndarray
+    spec: np.ndarray = None
+    spec_freqs: np.ndarray = None
+    total_written: int = 0
+    delay_s: dict = None
+
+
+# =========================
+# Motor de características
+# =========================
+class FeatureEngine:
+    """
+    Motor de procesamiento sin interfaz: ventana (N_CH × n) → FeatureFrame.
+
+    Compartido por main.py (tiempo real) y postprocess.py (offline).
+    Mantiene el estado incremental (StreamingFilterBank en modo streaming,
+    SlidingCWT si sliding=True); para usarlo sin estado basta con llamar
+    a process() sin total_written (y mode distinto de 'streaming').
+
+    Con sliding=True la CWT incremental se alimenta con un preprocesado
+    causal con estado (CausalPreprocessor): las columnas ya calculadas no
+    cambian en ticks posteriores y el resultado coincide con la CWT
+    completa de esa misma entrada. Es una definición distinta de la de
+    sliding=False (preprocesado de fase cero por ventana, la que usa el
+    análisis offline), no una aproximación de ella.
+
+    n_workers > 1 reparte los canales en bloques que se procesan en un
+    ThreadPoolExecutor (SciPy/NumPy liberan el GIL en filtros y FFT) y
+    se reúnen antes de devolver el frame. Llamar a close() al terminar.
+    """
+
+    def __init__(self, fs, n_ch, win_sec, theta_band, gamma_band,
+                 mode='wavelet', eps=1e-12, spec_freqs=None, sliding=True, n_workers=1):
+        if mode not in MODES:
+            raise ValueError(f"Modo desconocido: {mode}")
+        self.fs = fs
+        self.n_ch = n_ch
+        self.win_sec = win_sec
+        self.win_samples = int(win_sec * fs)
+        self.theta_band = tuple(theta_band)
+        self.gamma_band = tuple(gamma_band)
+        self.mode = mode
+        self.eps = eps
+
+        # Rejillas: escalas de las bandas (ratio) y completa (espectrograma)
+        self.band_freqs, self.band_masks = plan_frequency_grid(
+            fs, {'theta': self.theta_band, 'gamma': self.gamma_band})
+        if spec_freqs is None:
+            spec_freqs, _ = plan_frequency_grid(fs, {'spec': (1.0, 100.0)}, n_per_band=40, spacing='linear')
+        self.spec_freqs = np.asarray(spec_freqs, dtype=float)
+
+        # Estado incremental
+        self.stream = None
+        if mode == 'streaming':
+            self.stream = StreamingFilterBank(n_ch, fs, self.theta_band, self.gamma_band, self.win_samples)
+        # Bloques de canales y pool de hilos (None: todo en el hilo que llama)
+        self.blocks = channel_blocks(n_ch, n_workers)
+        self.pool = None
+        if len(self.blocks) > 1:
+            self.pool = ThreadPoolExecutor(max_workers=len(self.blocks), thread_name_prefix="FeatureEngine")
+
+        # CWT incremental: en wavelet, un SlidingCWT de bandas por bloque (cada
+        # uno con su propio estado) alimentado por un preprocesado causal por
+        # bloque; el del espectrograma reutiliza esa salida causal. En
+        # butterworth las bandas no usan CWT y el espectrograma tiene su propio
+        # preprocesado causal (todos los canales: ch_sel puede cambiar). En
+        # streaming la entrada causal es la de la propia cadena.
+        self.cwt = {}
+        self.pre = {}
+        if sliding:
+            if mode == 'wavelet':
+                self.pre = {i: CausalPreprocessor(blk.stop - blk.start, fs, self.win_samples)
+                            for i, blk in enumerate(self.blocks)}
+                self.cwt = {('bands', i): SlidingCWT(fs, self.win_samples, self.band_freqs)
+                            for i in range(len(self.blocks))}
+            elif mode == 'butterworth':
+                self.pre['spec'] = CausalPreprocessor(n_ch, fs, self.win_samples)
+            self.cwt['spec'] = SlidingCWT(fs, self.win_samples, self.spec_freqs)
+
+    @property
+    def delay_s(self):
+        """Retardo de grupo del modo streaming ({'theta': s, 'gamma': s}) o None."""
+        return self.stream.delay_s if self.stream is not None else None
+
+    def reset(self):
+        """Descarta el estado incremental (p. ej. al reiniciar una reproducción)."""
+        if self.stream is not None:
+            self.stream.reset()
+        for pre in self.pre.values():
+            pre.reset()
+        for sliding in self.cwt.values():
+            sliding.reset()
+
+    def close(self):
+        """Detiene el pool de hilos (si existe)."""
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+            self.pool = None
+
+    def _block_features(self, i, window, total_written):
+        """
+        Potencias theta/gamma de un bloque de canales (N_b, n).
+        Devuelve (raw, theta_pows, gamma_pows, theta_trace, gamma_trace) del
+        bloque; las trazas son la señal filtrada (butterworth) o la
+        envolvente wavelet de todos sus canales.
+        """
+        if i in self.pre and total_written is not None:
+            raw = self.pre[i].update(window, total_written)
+        else:
+            raw = preprocess_signal(window, fs=self.fs)
+        return (raw,) + self._band_powers(i, raw, total_written)
+
+    def _band_powers(self, i, raw, total_written):
+        # Filtrado Butterworth o CWT de bandas de un bloque ya preprocesado
+        fs = self.fs
+        if self.mode == 'butterworth':
+            # Corrección de ganancia de banda (precalculada en caché)
+            g_theta = bandpass_gain_factor(*self.theta_band, fs=fs)
+            g_gamma = bandpass_gain_factor(*self.gamma_band, fs=fs)
+
+            # Filtrado Butterworth (todos los canales del bloque) + corrección de ganancia
+            theta_filt = bandpass_sos(raw, *self.theta_band, fs=fs) / g_theta
+            gamma_filt = bandpass_sos(raw, *self.gamma_band, fs=fs) / g_gamma
+
+            # Potencias por canal a partir de las envolventes Hilbert
+            theta_pows = np.mean(envelope(theta_filt) ** 2, axis=1)
+            gamma_pows = np.mean(envelope(gamma_filt) ** 2, axis=1)
+            return theta_pows, gamma_pows, theta_filt, gamma_filt
+
+        # === mode == 'wavelet': solo escalas de las bandas ===
+        power_bands = cwt_power(raw, fs, self.band_freqs, total_written,
+                                self.cwt.get(('bands', i)), key='all')
+        theta_env = np.sqrt(np.mean(power_bands[:, self.band_masks['theta'], :], axis=1))
+        gamma_env = np.sqrt(np.mean(power_bands[:, self.band_masks['gamma'], :], axis=1))
+
+        theta_pows = np.mean(theta_env ** 2, axis=1)
+        gamma_pows = np.mean(gamma_env ** 2, axis=1)
+        return theta_pows, gamma_pows, theta_env, gamma_env
+
+    def band_powers(self, window):
+        """
+        Potencias theta/gamma (N,) de cada fila de window (N, n), sin estado
+        incremental ni pool. Las filas son independientes, así que sirve
+        para lotes de ventanas apiladas (análisis offline).
+        """
+        if self.mode == 'streaming':
+            raise ValueError("El modo streaming necesita estado: usar process().")
+        raw = preprocess_signal(window, fs=self.fs)
+        theta_pows, gamma_pows, _, _ = self._band_powers(0, raw, None)
+        return theta_pows, gamma_pows
+
+    def _map_blocks(self, window, total_written):
+        # Reparte los bloques en el pool (o en serie) y concatena por canal
+        args = [(i, window[blk], total_written) for i, blk in enumerate(self.blocks)]
+        if self.pool is None:
+            results = [self._block_features(*a) for a in args]
+        else:
+            results = list(self.pool.map(lambda a: self._block_features(*a), args))
+        if len(results) == 1:
+            return list(results[0])
+        return [np.concatenate(parts, axis=0) for parts in zip(*results)]
+
+    def process(self, window, total_written=None, ch_sel=0, want_spec=True):
+        """
+        Procesa la ventana actual (N_CH, n) y devuelve un FeatureFrame.
+
+        total_written: contador del RingBuffer correspondiente a window; permite
+        al estado incremental saber cuántas muestras son nuevas.
+        want_spec: calcula el espectrograma del canal seleccionado.
+        """
+        fs, mode = self.fs, self.mode
+
+        # Filtrado causal incremental (solo muestras nuevas)
+        if mode == 'streaming':
+            if total_written is None:
+                raise ValueError("El modo streaming requiere total_written.")
+            with probe('bands'):
+                self.stream.update(window, total_written)
+                theta_filt = self.stream.window('theta', self.win_samples)
+                gamma_filt = self.stream.window('gamma', self.win_samples)
+
+                # Potencia de la envolvente: E|x + jH(x)|² ≈ 2·E[x²] (banda estrecha),
+                # sin Hilbert sobre la ventana completa
+                theta_pows = 2 * np.mean(theta_filt ** 2, axis=1)
+                gamma_pows = 2 * np.mean(gamma_filt ** 2, axis=1)
+
+            # En streaming solo el canal seleccionado necesita preprocesado (espectrograma);
+            # la CWT incremental usa la salida causal de la propia cadena
+            raw_sel = None
+            if want_spec:
+                with probe('preprocess'):
+                    if 'spec' in self.cwt:
+                        raw_sel = self.stream.pre.window(self.win_samples)[ch_sel:ch_sel + 1]
+                    else:
+                        raw_sel = preprocess_signal(window[ch_sel:ch_sel + 1], fs=fs)
+        else:
+            # Preprocesado + bandas por bloques de canales (en paralelo si hay pool).
+            # Una sola medida en el hilo que llama: dentro de cada hilo del pool
+            # se contaría una vez por bloque
+            with probe('bands'):
+                raw, theta_pows, gamma_pows, theta_filt, gamma_filt = self._map_blocks(window, total_written)
+            raw_sel = raw[ch_sel:ch_sel + 1]
+            # Butterworth con CWT incremental: el espectrograma necesita la
+            # entrada causal, no la de fase cero de las bandas. Se actualiza en
+            # cada tick (solo muestras nuevas) para no cortar el estado de los filtros
+            if 'spec' in self.pre and total_written is not None:
+                with probe('preprocess'):
+                    causal = self.pre['spec'].update(window, total_written)
+                raw_sel = causal[ch_sel:ch_sel + 1]
+        theta_trace, gamma_trace = theta_filt[ch_sel], gamma_filt[ch_sel]
+
+        # Ratio por canal (vectorizado) y global
+        with probe('ratio'):
+            ratios = compute_tg_ratio(theta_pows, gamma_pows, self.eps)
+            ratio = float(np.median(ratios))
+
+        # Espectrograma: solo canal seleccionado y solo si se pide
+        spec = None
+        if want_spec:
+            with probe('spectrogram'):
+                spec = cwt_power(raw_sel, fs, self.spec_freqs, total_written,
+                                 self.cwt.get('spec'), key=ch_sel)[0]
+
+        return FeatureFrame(
+            mode=mode, ch_sel=ch_sel,
+            theta_pows=theta_pows, gamma_pows=gamma_pows,
+            ratios=ratios, ratio=ratio,
+            theta_trace=theta_trace, gamma_trace=gamma_trace,
+            spec=spec, spec_freqs=self.spec_freqs,
+            total_written=total_written or 0, delay_s=self.delay_s,
+        )
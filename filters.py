@@ -1,43 +1,257 @@
+from functools import lru_cache
 import numpy as np
-from scipy.signal import butter, sosfiltfilt, iirnotch, filtfilt, hilbert, savgol_filter, sosfreqz
+from scipy.signal import (butter, sosfiltfilt, sosfilt, sosfilt_zi, iirnotch, filtfilt, hilbert,
+                          savgol_filter, sosfreqz, tf2sos, sos2tf, group_delay, sos2zpk, tf2zpk)
 
-def bandpass_sos(x, low, high, order=4, fs=250, padlen=None):
+from ring_buffer import RingBuffer
+
+# Máximo de diseños distintos que se conservan en caché (LRU)
+FILTER_CACHE_SIZE = 64
+
+# Preprocesado (preprocess_signal): pasa-altos de deriva y notch de red
+HP_CUTOFF = 0.5
+NOTCH_FREQ = 50.0
+NOTCH_Q = 30.0
+
+
+# =========================
+# Diseños cacheados
+# =========================
+@lru_cache(maxsize=FILTER_CACHE_SIZE)
+def design_filter(ftype, band, order, fs, q=30.0):
+    """
+    Diseño de filtro cacheado, con clave (ftype, band, order, fs[, q]).
+      - ftype='band'     → SOS Butterworth pasa-banda, band=(low, high)
+      - ftype='highpass' → SOS Butterworth pasa-altos, band=(cutoff,)
+      - ftype='notch'    → (b, a) de iirnotch, band=(freq,)
+    Los coeficientes devueltos se comparten entre llamadas: no modificarlos.
+    """
     nyq = fs / 2
-    lown, highn = low / nyq, high / nyq
-    # Ensancha un poco la transición si la banda está alta
-    if high > 0.6 * nyq:
-        order = 3  # más estable en altas
-    sos = butter(order, [lown, highn], btype='band', output='sos')
+    if ftype == 'band':
+        coeffs = butter(order, [band[0] / nyq, band[1] / nyq], btype='band', output='sos')
+    elif ftype == 'highpass':
+        coeffs = butter(order, band[0] / nyq, btype='highpass', output='sos')
+    elif ftype == 'notch':
+        coeffs = iirnotch(band[0], q, fs)
+    else:
+        raise ValueError(f"Tipo de filtro desconocido: {ftype}")
+    return coeffs
+
+
+def bandpass_order(high, order, fs):
+    """Orden efectivo del pasa-banda: se reduce a 3 si la banda está alta."""
+    return 3 if high > 0.6 * (fs / 2) else order
+
+
+def bandpass_sos(x, low, high, order=4, fs=250, padlen=None, axis=-1):
+    # x puede ser 1D o una matriz (canales × muestras): se filtra a lo largo de `axis`
+    # Ensancha un poco la transición si la banda está alta (orden 3, más estable)
+    order = bandpass_order(high, order, fs)
+    sos = design_filter('band', (low, high), order, fs)
     # filtfilt con pad controlado para ventanas cortas
-    y = sosfiltfilt(sos, x, padlen=padlen if padlen is not None else 3 * (max(len(sos), 1)))
+    y = sosfiltfilt(sos, x, axis=axis,
+                    padlen=padlen if padlen is not None else 3 * (max(len(sos), 1)))
     return y
 
+@lru_cache(maxsize=FILTER_CACHE_SIZE)
 def check_bandpass_gain(low, high, fs=250, order=4):
-    sos = butter(order, [low/(fs/2), high/(fs/2)], btype='band', output='sos')
+    # Cacheada: el sosfreqz de 2048 puntos solo se evalúa una vez por diseño
+    sos = design_filter('band', (low, high), order, fs)
     w, h = sosfreqz(sos, worN=2048, fs=fs)
     # Ganancia media en banda
     mask = (w >= low) & (w <= high)
     g_db = 20*np.log10(np.maximum(np.abs(h[mask]), 1e-12))
     return float(np.median(g_db))
 
-def highpass_sos(x, cutoff=0.5, order=4, fs=250):
-    sos = butter(order, cutoff / (fs/2), btype='highpass', output='sos')
-    return sosfiltfilt(sos, x)
+@lru_cache(maxsize=FILTER_CACHE_SIZE)
+def bandpass_gain_factor(low, high, fs=250, order=4):
+    """Factor lineal de corrección de ganancia (divisor) precalculado."""
+    return 10 ** (check_bandpass_gain(low, high, fs=fs, order=order) / 20) + 1e-12
+
+def highpass_sos(x, cutoff=0.5, order=4, fs=250, axis=-1):
+    sos = design_filter('highpass', (cutoff,), order, fs)
+    return sosfiltfilt(sos, x, axis=axis)
 
-def notch_filter(x, notch_freq=50.0, q=30.0, fs=250):
-    b, a = iirnotch(notch_freq, q, fs)
-    return filtfilt(b, a, x)
+def notch_filter(x, notch_freq=50.0, q=30.0, fs=250, axis=-1):
+    b, a = design_filter('notch', (notch_freq,), 2, fs, q=q)
+    return filtfilt(b, a, x, axis=axis)
 
-def smooth_signal(x, window=21, poly=3):
-    if len(x) > window:
-        return savgol_filter(x, window_length=window, polyorder=poly)
+def smooth_signal(x, window=21, poly=3, axis=-1):
+    if x.shape[axis] > window:
+        return savgol_filter(x, window_length=window, polyorder=poly, axis=axis)
     return x
 
-def preprocess_signal(x, fs=250):
-    x = highpass_sos(x, cutoff=0.5, fs=fs)
-    x = notch_filter(x, notch_freq=50, fs=fs)
-    #x = smooth_signal(x)
+def preprocess_signal(x, fs=250, axis=-1):
+    # Acepta una matriz (canales × muestras): todos los canales en una sola llamada
+    x = highpass_sos(x, cutoff=HP_CUTOFF, fs=fs, axis=axis)
+    x = notch_filter(x, notch_freq=NOTCH_FREQ, q=NOTCH_Q, fs=fs, axis=axis)
+    #x = smooth_signal(x, axis=axis)
     return x
 
-def envelope(x):
-    return np.abs(hilbert(x))
+def preprocess_poles(fs=250):
+    """Polos de la cadena de preprocess_signal (pasa-altos y notch)."""
+    p_hp = sos2zpk(design_filter('highpass', (HP_CUTOFF,), 4, fs))[1]
+    p_notch = tf2zpk(*design_filter('notch', (NOTCH_FREQ,), 2, fs, q=NOTCH_Q))[1]
+    return np.concatenate((p_hp, p_notch))
+
+def bandpass_poles(low, high, order=4, fs=250):
+    """Polos del pasa-banda de bandpass_sos (con su orden efectivo)."""
+    return sos2zpk(design_filter('band', (low, high), bandpass_order(high, order, fs), fs))[1]
+
+def envelope(x, axis=-1):
+    return np.abs(hilbert(x, axis=axis))
+
+
+# =========================
+# Preprocesado causal con estado
+# =========================
+class CausalPreprocessor:
+    """
+    Versión causal de preprocess_signal (pasa-altos → notch con sosfilt).
+
+    Conserva el estado zi entre llamadas, así que cada muestra se
+    preprocesa una sola vez y no cambia en ticks posteriores (al contrario
+    que filtfilt sobre la ventana completa, que modifica toda la ventana en
+    cada tick). Las salidas se guardan en un RingBuffer del largo de la
+    ventana; es la entrada que necesita SlidingCWT.
+    """
+
+    def __init__(self, n_ch, fs, win_samples, order=4, hp_cutoff=0.5, notch_freq=50.0, q=30.0):
+        self.n_ch = n_ch
+        self.fs = fs
+        self.sos_hp = design_filter('highpass', (hp_cutoff,), order, fs)
+        self.sos_notch = tf2sos(*design_filter('notch', (notch_freq,), 2, fs, q=q))
+        self.out = RingBuffer(n_ch, win_samples)
+        self.reset()
+
+    def reset(self):
+        self.zi = None
+        self.samples_seen = 0
+        self.out.clear()
+
+    def process(self, chunk):
+        """Preprocesa un bloque nuevo (N_CH, k), lo añade a la salida y lo devuelve."""
+        chunk = np.asarray(chunk, dtype=np.float64)
+        if chunk.shape[1] == 0:
+            return chunk
+        if self.zi is None:
+            # Pasa-altos en régimen estacionario con la primera muestra
+            # para evitar el transitorio del offset DC del ADC
+            self.zi = {"hp": sosfilt_zi(self.sos_hp)[:, None, :] * chunk[:, 0][None, :, None],
+                       "notch": np.zeros((len(self.sos_notch), self.n_ch, 2))}
+        x, self.zi["hp"] = sosfilt(self.sos_hp, chunk, axis=-1, zi=self.zi["hp"])
+        x, self.zi["notch"] = sosfilt(self.sos_notch, x, axis=-1, zi=self.zi["notch"])
+        self.out.extend(x)
+        return x
+
+    def update(self, window, total_written):
+        """
+        Preprocesa solo las muestras nuevas de `window` y devuelve la ventana
+        preprocesada (N_CH, n) alineada con ella.
+        """
+        n_new = min(total_written - self.samples_seen, window.shape[1])
+        self.samples_seen = total_written
+        self.process(window[:, window.shape[1] - max(n_new, 0):])
+        return self.out.latest(window.shape[1])
+
+    def window(self, n=None):
+        """Últimas n muestras preprocesadas (N_CH, n)."""
+        return self.out.latest(n)
+
+
+# =========================
+# Banco de filtros causal (streaming)
+# =========================
+class StreamingFilterBank:
+    """
+    Alternativa causal a sosfiltfilt sobre la ventana completa.
+
+    Mantiene el estado zi de sosfilt por canal y por etapa
+    (pasa-altos → notch → banda theta / banda gamma), de modo que en cada
+    tick solo se filtran las muestras nuevas. Las salidas se guardan en
+    dos RingBuffer (theta, gamma) del largo de la ventana.
+
+    Al ser causal introduce retardo: ver group_delay().
+    """
+
+    def __init__(self, n_ch, fs, theta_band, gamma_band, win_samples,
+                 order=4, hp_cutoff=0.5, notch_freq=50.0, q=30.0):
+        self.n_ch = n_ch
+        self.fs = fs
+        self.bands = {"theta": tuple(theta_band), "gamma": tuple(gamma_band)}
+
+        # Preprocesado causal (su salida alimenta también el espectrograma)
+        self.pre = CausalPreprocessor(n_ch, fs, win_samples, order=order, hp_cutoff=hp_cutoff,
+                                      notch_freq=notch_freq, q=q)
+        self.sos_hp, self.sos_notch = self.pre.sos_hp, self.pre.sos_notch
+
+        # Diseños (desde la caché) y corrección de ganancia idéntica al modo butterworth
+        self.sos_band, self.gain = {}, {}
+        for name, (low, high) in self.bands.items():
+            self.sos_band[name] = design_filter('band', (low, high), bandpass_order(high, order, fs), fs)
+            self.gain[name] = bandpass_gain_factor(low, high, fs=fs)
+
+        self.out = {name: RingBuffer(n_ch, win_samples) for name in self.bands}
+        self.samples_seen = 0   # valor de total_written ya filtrado
+        self.delay_s = self.group_delay()
+        self.reset()
+
+    def reset(self):
+        """Reinicia estados y salidas (p. ej. al reiniciar la reproducción)."""
+        self.zi = None
+        self.samples_seen = 0
+        self.pre.reset()
+        for buf in self.out.values():
+            buf.clear()
+
+    def process(self, chunk):
+        """
+        Filtra un bloque nuevo (N_CH, k) y lo añade a las salidas.
+        Devuelve {banda: señal filtrada (N_CH, k)}.
+        """
+        chunk = np.asarray(chunk, dtype=np.float64)
+        if chunk.shape[1] == 0:
+            return {name: chunk for name in self.bands}
+        if self.zi is None:
+            self.zi = {name: np.zeros((len(sos), self.n_ch, 2)) for name, sos in self.sos_band.items()}
+
+        x = self.pre.process(chunk)
+
+        result = {}
+        for name, sos in self.sos_band.items():
+            y, self.zi[name] = sosfilt(sos, x, axis=-1, zi=self.zi[name])
+            y /= self.gain[name]
+            self.out[name].extend(y)
+            result[name] = y
+        return result
+
+    def update(self, window, total_written):
+        """
+        Filtra solo las muestras de `window` que aún no se han procesado.
+        total_written es el contador del RingBuffer que produjo la ventana.
+        """
+        n_new = min(total_written - self.samples_seen, window.shape[1])
+        self.samples_seen = total_written
+        return self.process(window[:, window.shape[1] - max(n_new, 0):])
+
+    def window(self, name, n=None):
+        """Últimas n muestras filtradas de la banda `name` (N_CH, n)."""
+        return self.out[name].latest(n)
+
+    def group_delay(self):
+        """
+        Retardo de grupo total (s) de la cadena causal pasa-altos → notch →
+        banda, evaluado en la frecuencia central de cada banda.
+        Devuelve {'theta': s, 'gamma': s}.
+        """
+        delays = {}
+        for name, (low, high) in self.bands.items():
+            fc = np.sqrt(low * high)
+            total = 0.0
+            for sos in (self.sos_hp, self.sos_notch, self.sos_band[name]):
+                for section in sos:
+                    _, gd = group_delay(sos2tf(section[None, :]), w=[fc], fs=self.fs)
+                    total += float(gd[0])
+            delays[name] = total / self.fs
+        return delays
+
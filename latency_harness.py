@@ -0,0 +1,157 @@
+# latency_harness.py
+"""
+Latencia muestra → feedback sin interfaz (apto para CI en Linux sin hardware).
+
+Usa PulseBoard (ráfagas theta en instantes conocidos) con el mismo pipeline
+que main.py: AcquisitionThread → ThreadSafeRingBuffer → AdaptiveScheduler →
+FeatureEngine → set_brain_ratio. Para cada ráfaga mide el tiempo desde su primera muestra
+hasta que el ratio entregado al juego cruza el umbral.
+
+    python latency_harness.py --mode wavelet --duration 60 --threshold 0.5
+"""
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+from acquisition import AcquisitionThread
+from features import FeatureEngine, MODES
+from ring_buffer import ThreadSafeRingBuffer
+from pulse_board import PulseBoard
+from profiling import STAGES
+from scheduler import AdaptiveScheduler
+
+THETA_BAND = (4.0, 8.0)
+GAMMA_BAND = (30.0, 100.0)
+
+
+class RatioSink:
+    """Sustituto del juego: registra (time.time(), ratio) de cada set_brain_ratio."""
+
+    def __init__(self):
+        self.events = []
+
+    def set_brain_ratio(self, ratio):
+        self.events.append((time.time(), ratio))
+
+
+def crossing_latencies(onsets, events, threshold, burst_period):
+    """
+    Latencia (s) de cada ráfaga: primer evento con ratio >= threshold entre
+    el inicio de la ráfaga y la siguiente. NaN si no llega a cruzar.
+    """
+    if not events:
+        return np.full(len(onsets), np.nan)
+    t_ev, r_ev = np.array(events).T
+    lat = []
+    for onset in onsets:
+        hit = np.flatnonzero((t_ev >= onset) & (t_ev < onset + burst_period) & (r_ev >= threshold))
+        lat.append(t_ev[hit[0]] - onset if hit.size else np.nan)
+    return np.array(lat)
+
+
+def run(args):
+    board = PulseBoard(fs=args.fs, n_ch=args.n_ch, burst_period=args.burst_period,
+                       burst_dur=args.burst_dur, first_burst=args.win_sec + 1.0)
+    board.prepare_session()
+    board.start_stream()
+    eeg_channels = board.get_eeg_channels()
+
+    win_samples = args.win_sec * args.fs
+    buffer = ThreadSafeRingBuffer(args.n_ch, win_samples, dtype=np.float64)
+    engine = FeatureEngine(args.fs, args.n_ch, args.win_sec, THETA_BAND, GAMMA_BAND,
+                           mode=args.mode, n_workers=args.workers)
+    sink = RatioSink()
+    acq = AcquisitionThread(board, eeg_channels, buffer, poll_ms=args.poll_ms)
+    acq.start()
+
+    # Mismo bucle que el temporizador de análisis de main.py
+    sched = AdaptiveScheduler(args.fs, max(1, int(args.hop_ms * args.fs / 1000)),
+                              max_hop=int(args.max_hop_ms * args.fs / 1000), poll_ms=args.sched_ms)
+    period = args.sched_ms / 1000.0
+    t_end = time.time() + args.duration
+    try:
+        while time.time() < t_end:
+            t_tick = time.perf_counter()
+            acq.drain_chunks()   # main.py los pasa al grabador
+            if buffer.total_written >= win_samples and sched.due(buffer.total_written):
+                window, total = buffer.snapshot(win_samples)
+                with sched.running(total):
+                    frame = engine.process(window, total, want_spec=args.spec)
+                sink.set_brain_ratio(frame.ratio)
+            time.sleep(max(0.0, period - (time.perf_counter() - t_tick)))
+    finally:
+        acq.stop()
+        engine.close()
+        board.stop_stream()
+        board.release_session()
+
+    onsets = board.burst_onsets(args.duration)
+    lat = crossing_latencies(onsets, sink.events, args.threshold, args.burst_period)
+    hits = lat[~np.isnan(lat)] * 1000.0
+    ratios = np.array([r for _, r in sink.events])
+
+    result = {
+        "mode": args.mode, "fs": args.fs, "n_ch": args.n_ch, "win_sec": args.win_sec,
+        "hop_ms": args.hop_ms, "threshold": args.threshold,
+        "bursts": int(len(onsets)), "detected": int(hits.size), "ticks": len(sink.events),
+        "ratio_min": float(ratios.min()) if ratios.size else None,
+        "ratio_max": float(ratios.max()) if ratios.size else None,
+        "latencies_ms": [float(v) for v in lat * 1000.0],
+        "scheduler": sched.stats(),
+    }
+    if hits.size:
+        p50, p95, p99 = np.percentile(hits, [50, 95, 99])
+        result.update(min_ms=float(hits.min()), p50_ms=float(p50), p95_ms=float(p95),
+                      p99_ms=float(p99), max_ms=float(hits.max()))
+    return result
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Latencia muestra → ratio con una board de ráfagas conocidas.")
+    p.add_argument("--mode", choices=MODES, default="wavelet")
+    p.add_argument("--fs", type=int, default=250)
+    p.add_argument("--n-ch", type=int, default=8)
+    p.add_argument("--win-sec", type=int, default=5)
+    p.add_argument("--hop-ms", type=float, default=80, help="muestras nuevas mínimas por cómputo (ms)")
+    p.add_argument("--max-hop-ms", type=float, default=500)
+    p.add_argument("--sched-ms", type=float, default=10, help="cadencia del planificador")
+    p.add_argument("--poll-ms", type=int, default=20)
+    p.add_argument("--workers", type=int, default=1)
+    p.add_argument("--spec", action="store_true", help="calcular también el espectrograma")
+    p.add_argument("--threshold", type=float, default=0.5)
+    p.add_argument("--duration", type=float, default=60.0, help="segundos de stream")
+    p.add_argument("--burst-period", type=float, default=8.0)
+    p.add_argument("--burst-dur", type=float, default=2.0)
+    p.add_argument("--max-p95-ms", type=float, default=None, help="falla (exit 1) si p95 lo supera")
+    p.add_argument("--profile", action="store_true", help="incluir tiempos por etapa")
+    p.add_argument("--out", default=None, help="guardar el resultado en JSON")
+    args = p.parse_args(argv)
+
+    STAGES.enabled = args.profile
+    result = run(args)
+    if args.profile:
+        result["stages"] = STAGES.summary()
+
+    print(f"[INFO] Ráfagas detectadas: {result['detected']}/{result['bursts']} "
+          f"(ratio {result['ratio_min']:.2f}–{result['ratio_max']:.2f})"
+          if result["ticks"] else "[WARN] Ningún tick con ventana completa.")
+    if result["detected"]:
+        print(f"[INFO] Latencia (ms): p50 {result['p50_ms']:.0f}, p95 {result['p95_ms']:.0f}, "
+              f"p99 {result['p99_ms']:.0f}, máx {result['max_ms']:.0f}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"[INFO] Resultado guardado en {args.out}")
+
+    if result["detected"] == 0:
+        return 1
+    if args.max_p95_ms is not None and result["p95_ms"] > args.max_p95_ms:
+        print(f"[ERROR] p95 {result['p95_ms']:.0f} ms > {args.max_p95_ms:.0f} ms")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
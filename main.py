@@ -1,145 +1,241 @@
 # main.py
 import sys, time, os
-from PyQt5 import QtWidgets, QtCore
+from PyQt5 import QtWidgets, QtCore, QtGui
 import pyqtgraph as pg
-from collections import deque
 import numpy as np
 from datetime import datetime
 
-from board_manager import init_board, get_eeg_channels
-from processing import update_loop
+from board_manager import init_board, get_eeg_channels, get_timestamp_channel
+from acquisition import AcquisitionThread
+from processing import render_frame
+from features import FeatureEngine
+from filters import StreamingFilterBank
+from ring_buffer import ThreadSafeRingBuffer
+from compute_worker import SharedRingBuffer, ComputeWorker
+from profiling import STAGES, probe
+from scheduler import AdaptiveScheduler
+from recording import RecordingWriter, CYTON_LSB_UV
 from plotting import create_ui, connect_channel_controls, ConfigDialog
 from gamification.corsi import CorsiGame
 
-# =========================
-# Configuración inicial con ventana
-# =========================
-app = QtWidgets.QApplication(sys.argv)
-
 # Opciones disponibles
 fs_values = [125, 250]
 n_ch_values = [4, 8, 16]
 win_sec_values = [5, 10, 15]
-mode_values = ["butterworth", "wavelet"]
-
-dlg = ConfigDialog(fs_values, n_ch_values, win_sec_values, mode_values)
-if dlg.exec_() == QtWidgets.QDialog.Rejected:
-    sys.exit(0)
-cfg = dlg.get_config()
-
-FS, N_CH, WIN_SEC, MODE = cfg["FS"], cfg["N_CH"], cfg["WIN_SEC"], cfg["MODE"]
-
-UPDATE_MS = 80
+mode_values = ["butterworth", "wavelet", "streaming"]
+exec_values = ["local", "proceso"]   # proceso: cómputo en un proceso aparte
+worker_values = [1, 2, 4, 8]         # hilos por bloques de canales (FeatureEngine)
+
+ANALYSIS_HOP_MS = 80  # muestras nuevas mínimas por cómputo (en ms de señal)
+MAX_HOP_MS = 500      # hop máximo bajo sobrecarga (backpressure)
+SCHED_POLL_MS = 10    # cadencia con la que se comprueba si hay muestras suficientes
+RENDER_MS = 33        # refresco de la interfaz (~30 fps), independiente del análisis
+ACQ_POLL_MS = 20   # cadencia del hilo de adquisición
+# CWT incremental (solo columnas nuevas, coste proporcional al salto). Desactivada
+# por defecto: cada tick recalcula la CWT de toda la ventana (coste proporcional
+# a la ventana). Activarla usa preprocesado causal para el espectrograma y las
+# bandas wavelet, que no es la definición de fase cero del análisis offline
+# (ver FeatureEngine y README)
+CWT_SLIDING = False
 OFFSET = 250
 
 THETA_BAND = (4.0, 8.0)
 GAMMA_BAND = (30.0, 100.0)
 EPS = 1e-12
 
-# =========================
-# Inicializar Board
-# =========================
-board = init_board()
-print('init')
-eeg_channels = get_eeg_channels(board, N_CH)
-print('channels')
-
-# =========================
-# Buffers
-# =========================
-WIN_SAMPLES = WIN_SEC * FS
-buffers = [deque(np.zeros(WIN_SAMPLES), maxlen=WIN_SAMPLES) for _ in range(N_CH)]
-
-# Acumulador de datos crudos (para guardar)
-record_data = []
-
-# =========================
-# Interfaz gráfica
-# =========================
-pg.setConfigOptions(antialias=True, background='#111218', foreground='w')
-main, ui = create_ui(N_CH, WIN_SEC, OFFSET, FS)
-ch_sel = {"idx": 0}
-connect_channel_controls(ui, N_CH, lambda new_idx: ch_sel.update(idx=new_idx))
-
-# =========================
-# Inicializar juego Corsi
-# =========================
-game = CorsiGame(grid_size=3, sequence_len=5)
-
-# =========================
-# Update loop
-# =========================
-t0 = time.time()
-def update():
-    global record_data
-    data = board.get_current_board_data(WIN_SAMPLES)
-    #print(data)
-    if data.shape[1] == 0:
-        return
-
-    # Actualizar buffers para visualización
-    for i, ch in enumerate(eeg_channels):
-        buffers[i].extend(data[ch][-WIN_SAMPLES:])
-
-    # Guardar los datos crudos (en fila por canal)
-    record_data.append(data[eeg_channels])
-
-    # ---- Neurofeedback ----
-    ratio = update_loop(buffers, FS, THETA_BAND, GAMMA_BAND, EPS,
-                 ui, t0, ch_sel["idx"], WIN_SEC, OFFSET, MODE)
-    # Enviar ratio al juego
-    game.set_brain_ratio(ratio)
-
-timer = QtCore.QTimer()
-timer.timeout.connect(update)
-timer.start(UPDATE_MS)
-
-# =========================
-# Guardado periódico
-# =========================
-SAVE_INTERVAL = 15  # segundos
-last_save = time.time()
-save_dir = "recordings"
-os.makedirs(save_dir, exist_ok=True)
-session_id = datetime.now().strftime("%Y%m%d_%H%M%S")
-
-def save_data():
-    global record_data, last_save
-    if not record_data:
-        return
-    arr = np.hstack(record_data)  # concat por tiempo
-    record_data = []  # vaciar para ahorrar RAM
-
-    filename = os.path.join(save_dir, f"session_{session_id}.npz")
-    np.savez_compressed(filename,
-                        eeg=arr,
-                        fs=FS,
-                        channels=N_CH,
-                        mode=MODE,
-                        theta_band=THETA_BAND,
-                        gamma_band=GAMMA_BAND)
-    print(f"[INFO] Datos guardados en {filename}")
-
-def periodic_save():
-    global last_save
-    if time.time() - last_save >= SAVE_INTERVAL:
-        save_data()
-        last_save = time.time()
-
-save_timer = QtCore.QTimer()
-save_timer.timeout.connect(periodic_save)
-save_timer.start(1000)
-
-# =========================
-# Run
-# =========================
-if __name__ == '__main__':
+save_dir = "recordings"   # session_<id>.json + .raw (append-only, ver recording.py)
+RECORD_CODEC = "float32"  # "int24"/"int32": enteros escalados (sin pérdida a la resolución de Cyton)
+RECORD_SCALE_UV = CYTON_LSB_UV
+
+PROFILE = False     # tiempos por etapa → recordings/profile_<sesión>.csv al cerrar
+
+
+# Todo el arranque vive en main(): con el proceso de cómputo ('spawn') el
+# hijo reimporta este módulo y no debe abrir la interfaz ni la board.
+def main():
+    # =========================
+    # Configuración inicial con ventana
+    # =========================
+    app = QtWidgets.QApplication(sys.argv)
+
+    dlg = ConfigDialog(fs_values, n_ch_values, win_sec_values, mode_values,
+                       exec_values=exec_values, worker_values=worker_values,
+                       default_workers=min(4, os.cpu_count() or 1))
+    if dlg.exec_() == QtWidgets.QDialog.Rejected:
+        sys.exit(0)
+    cfg = dlg.get_config()
+
+    FS, N_CH, WIN_SEC, MODE = cfg["FS"], cfg["N_CH"], cfg["WIN_SEC"], cfg["MODE"]
+    EXEC, N_WORKERS = cfg["EXEC"], cfg["N_WORKERS"]
+
+    os.makedirs(save_dir, exist_ok=True)
+    session_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+    STAGES.enabled = PROFILE
+
+    # =========================
+    # Inicializar Board
+    # =========================
+    board = init_board()
+    print('init')
+    eeg_channels = get_eeg_channels(board, N_CH)
+    print('channels')
+
+    # =========================
+    # Buffers
+    # =========================
+    WIN_SAMPLES = WIN_SEC * FS
+    MIN_NEW = max(1, int(ANALYSIS_HOP_MS * FS / 1000))
+    if EXEC == "proceso":
+        buffer = SharedRingBuffer(N_CH, WIN_SAMPLES, dtype=np.float64)
+    else:
+        buffer = ThreadSafeRingBuffer(N_CH, WIN_SAMPLES, dtype=np.float64)
+
+    # =========================
+    # Grabación append-only (hilo escritor propio)
+    # =========================
+    recorder = RecordingWriter(os.path.join(save_dir, f"session_{session_id}"), FS, N_CH,
+                               meta={"mode": MODE, "win_sec": WIN_SEC, "session": session_id,
+                                     "theta_band": THETA_BAND, "gamma_band": GAMMA_BAND},
+                               codec=RECORD_CODEC, scale=RECORD_SCALE_UV)
+    print(f"[INFO] Grabando en {recorder.raw_path} (tecla M: marcar evento)")
+
+    def record_pending():
+        # Chunks nuevos leídos por el hilo de adquisición (sin duplicados)
+        for chunk, board_ts in acq.drain_chunks(timestamps=True):
+            recorder.append(chunk, board_ts)
+
+    # =========================
+    # Hilo de adquisición (independiente del QTimer)
+    # =========================
+    acq = AcquisitionThread(board, eeg_channels, buffer, poll_ms=ACQ_POLL_MS,
+                            timestamp_channel=get_timestamp_channel(board))
+    acq.start()
+    recorder.mark("inicio")
+
+    # =========================
+    # Interfaz gráfica
+    # =========================
+    pg.setConfigOptions(antialias=True, background='#111218', foreground='w')
+    main_win, ui = create_ui(N_CH, WIN_SEC, OFFSET, FS)
+    ch_sel = {"idx": 0}
+    connect_channel_controls(ui, N_CH, lambda new_idx: ch_sel.update(idx=new_idx))
+
+    # Marcadores de eventos en la grabación
+    n_marks = {"n": 0}
+    def mark_event():
+        record_pending()   # el marcador queda detrás de las muestras ya leídas
+        n_marks["n"] += 1
+        recorder.mark(f"marca {n_marks['n']}")
+        print(f"[INFO] Evento marcado: marca {n_marks['n']}")
+    QtWidgets.QShortcut(QtGui.QKeySequence("M"), main_win, activated=mark_event)
+
+    # =========================
+    # Motor de características (DSP sin Qt, compartido con postprocess.py)
+    # =========================
+    engine_kwargs = dict(fs=FS, n_ch=N_CH, win_sec=WIN_SEC, theta_band=THETA_BAND,
+                         gamma_band=GAMMA_BAND, mode=MODE, eps=EPS,
+                         spec_freqs=ui['freqs'], sliding=CWT_SLIDING, n_workers=N_WORKERS)
+    # Proceso de cómputo opcional: la GUI solo renderiza los frames recibidos
+    # (el motor vive en el proceso hijo y aquí no se construye)
+    engine, worker = None, None
+    if EXEC == "proceso":
+        profile_path = os.path.join(save_dir, f"profile_{session_id}_worker.csv") if PROFILE else None
+        worker = ComputeWorker(buffer, engine_kwargs, min_new=MIN_NEW, profile_path=profile_path)
+        worker.start()
+        print("[INFO] Cómputo en proceso aparte.")
+    else:
+        engine = FeatureEngine(**engine_kwargs)
+    if MODE == "streaming":
+        gd = StreamingFilterBank(N_CH, FS, THETA_BAND, GAMMA_BAND, WIN_SAMPLES).delay_s
+        print(f"[INFO] Retardo de grupo streaming: theta {gd['theta']*1000:.0f} ms, "
+              f"gamma {gd['gamma']*1000:.0f} ms")
+
+    # =========================
+    # Inicializar juego Corsi
+    # =========================
+    game = CorsiGame(grid_size=3, sequence_len=5)
+
+    # =========================
+    # Update loop: análisis (según muestras nuevas) y render (a su propio ritmo)
+    # =========================
+    sched = AdaptiveScheduler(FS, MIN_NEW, max_hop=int(MAX_HOP_MS * FS / 1000),
+                              poll_ms=SCHED_POLL_MS)
+    latest = {"frame": None, "window": None, "t": 0.0, "fresh": False}
+    t0 = time.time()
+    def update():
+        with probe('tick'):
+            tick()
+
+    def tick():
+        record_pending()
+
+        if worker is not None:
+            # ---- Neurofeedback (frames del proceso de cómputo) ----
+            worker.set_request(ch_sel["idx"], ui['chk_spec'].isChecked())
+            frame = worker.latest_frame()
+            if frame is None:
+                return
+            window = None   # el render lee la ventana cruda del buffer compartido
+        else:
+            if not sched.due(buffer.total_written):
+                return
+
+            # ---- Neurofeedback ----
+            window, total = buffer.snapshot(WIN_SAMPLES)
+            with sched.running(total):
+                frame = engine.process(window, total, ch_sel=ch_sel["idx"],
+                                       want_spec=ui['chk_spec'].isChecked())
+        latest.update(frame=frame, window=window, t=time.time() - t0, fresh=True)
+        # Enviar ratio al juego (a la cadencia del análisis, sin esperar al render)
+        game.set_brain_ratio(frame.ratio)
+
+    def render():
+        # Solo el frame más reciente; los intermedios no se dibujan
+        if not latest["fresh"]:
+            return
+        latest["fresh"] = False
+        window = latest["window"] if latest["window"] is not None else buffer.latest(WIN_SAMPLES)
+        with probe('render'):
+            render_frame(ui, latest["frame"], window, latest["t"], OFFSET)
+
+    timer = QtCore.QTimer()
+    timer.setTimerType(QtCore.Qt.PreciseTimer)
+    timer.timeout.connect(update)
+    timer.start(SCHED_POLL_MS)
+
+    render_timer = QtCore.QTimer()
+    render_timer.timeout.connect(render)
+    render_timer.start(RENDER_MS)
+
+    # =========================
+    # Run
+    # =========================
     try:
-        main.show()
+        main_win.show()
         # Ejecutar el juego en paralelo (otro thread Qt)
         QtCore.QTimer.singleShot(2000, game.run)  # lanzar tras 2 seg
         sys.exit(app.exec_())
     finally:
-        save_data()
+        acq.stop()
+        print(f"[INFO] Adquisición: {acq.stats()}")
+        if worker is None:
+            print(f"[INFO] Planificador: {sched.stats()}")
+        else:
+            worker.stop()
+        if engine is not None:
+            engine.close()
+        record_pending()
+        recorder.mark("fin")
+        recorder.close()
+        print(f"[INFO] Grabación: {recorder.stats()} → {recorder.raw_path}")
         board.stop_stream()
         board.release_session()
+        if isinstance(buffer, SharedRingBuffer):
+            buffer.close()
+        if PROFILE:
+            path = STAGES.export(os.path.join(save_dir, f"profile_{session_id}.csv"))
+            print(f"[INFO] Tiempos por etapa guardados en {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,12 +5,16 @@ import pyqtgraph as pg
 from PyQt5 import QtWidgets, QtCore
 from collections import deque
 
+from cwt import plan_frequency_grid
+
 # -------------------------
 # Ventana de configuración inicial
 # -------------------------
 class ConfigDialog(QtWidgets.QDialog):
     def __init__(self, fs_values, n_ch_values, win_sec_values, mode_values,
-                 default_fs=250, default_n_ch=8, default_win=10, default_mode="wavelet"):
+                 default_fs=250, default_n_ch=8, default_win=10, default_mode="wavelet",
+                 exec_values=("local",), default_exec="local",
+                 worker_values=(1,), default_workers=1):
         super().__init__()
         self.setWindowTitle("Configuración de sesión")
         self.setStyleSheet("background-color: #111218; color: white; font-size:24px;")
@@ -29,10 +33,18 @@ class ConfigDialog(QtWidgets.QDialog):
         self.mode_cb = QtWidgets.QComboBox(); [self.mode_cb.addItem(v) for v in mode_values]
         self.mode_cb.setCurrentText(default_mode)
 
+        self.exec_cb = QtWidgets.QComboBox(); [self.exec_cb.addItem(v) for v in exec_values]
+        self.exec_cb.setCurrentText(default_exec)
+
+        self.workers_cb = QtWidgets.QComboBox(); [self.workers_cb.addItem(str(v)) for v in worker_values]
+        self.workers_cb.setCurrentText(str(default_workers))
+
         layout.addRow("Frecuencia de muestreo (Hz):", self.fs_cb)
         layout.addRow("Número de canales:", self.nch_cb)
         layout.addRow("Ventana (s):", self.win_cb)
         layout.addRow("Modo de procesamiento:", self.mode_cb)
+        layout.addRow("Ejecución del cómputo:", self.exec_cb)
+        layout.addRow("Hilos de cómputo:", self.workers_cb)
 
         # Botones
         btns = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel)
@@ -44,7 +56,9 @@ class ConfigDialog(QtWidgets.QDialog):
             "FS": int(self.fs_cb.currentText()),
             "N_CH": int(self.nch_cb.currentText()),
             "WIN_SEC": int(self.win_cb.currentText()),
-            "MODE": self.mode_cb.currentText()
+            "MODE": self.mode_cb.currentText(),
+            "EXEC": self.exec_cb.currentText(),
+            "N_WORKERS": int(self.workers_cb.currentText())
         }
 
 # -------------------------
@@ -170,6 +184,12 @@ def create_ui(N_CH, WIN_SEC, OFFSET, FS):
     ctrl_layout.addWidget(btn_prev)
     ctrl_layout.addWidget(lbl_channel)
     ctrl_layout.addWidget(btn_next)
+    ctrl_layout.addSpacing(30)
+    # El espectrograma (rejilla completa de la CWT) solo se calcula si está visible
+    chk_spec = QtWidgets.QCheckBox("Espectrograma")
+    chk_spec.setChecked(True)
+    chk_spec.setStyleSheet("font-size:16px; color:white;")
+    ctrl_layout.addWidget(chk_spec)
     ctrl_layout.addStretch()
     vlayout.addLayout(ctrl_layout)
 
@@ -249,8 +269,9 @@ def create_ui(N_CH, WIN_SEC, OFFSET, FS):
     p_cwt.setLabel('left','Frecuencia', units='Hz')
     img_cwt = pg.ImageItem()
     p_cwt.addItem(img_cwt)
-    p_cwt.setYRange(0, 100)
-    freqs = np.linspace(1, 100, 40)
+    # Rejilla completa (lineal) recortada a Nyquist
+    freqs, _ = plan_frequency_grid(FS, {"spec": (1.0, 100.0)}, n_per_band=40, spacing='linear')
+    p_cwt.setYRange(0, freqs[-1])
     t_cwt = np.linspace(-WIN_SEC, 0, WIN_SEC*250)
     colormap = pg.colormap.get("viridis")
     lut = colormap.getLookupTable(0.0, 1.0, 256)
@@ -260,12 +281,13 @@ def create_ui(N_CH, WIN_SEC, OFFSET, FS):
         add_help_button(p_cwt, INFO.get("wavelet", "Espectrograma Wavelet"))
     except Exception:
         pass
+    chk_spec.toggled.connect(p_cwt.setVisible)
 
     # -------------------------
     # Diccionario UI (retorno)
     # -------------------------
     ui = {
-        "btn_prev": btn_prev, "btn_next": btn_next, "lbl_channel": lbl_channel,
+        "btn_prev": btn_prev, "btn_next": btn_next, "lbl_channel": lbl_channel, "chk_spec": chk_spec,
         "p_ratio": p_ratio, "curve_ratio": curve_ratio,
         "ratio_t": deque(maxlen=30 * 1000 // 100), "ratio_y": deque(maxlen=30 * 1000 // 100),
         "curves_raw": curves_raw, "curve_theta": curve_theta, "curve_gamma": curve_gamma,
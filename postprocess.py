@@ -1,29 +1,44 @@
 import sys, time, os
+import threading
 from PyQt5 import QtWidgets, QtCore
 import pyqtgraph as pg
-from collections import deque
 import numpy as np
 from datetime import datetime
 
-from processing import compute_wavelet, update_wavelet_plot
-from filters import bandpass_sos, preprocess_signal, check_bandpass_gain, envelope
+from processing import render_frame
+from features import FeatureEngine, FeatureFrame
+from cwt import plan_frequency_grid
 from plotting import create_ui, connect_channel_controls
+from ring_buffer import RingBuffer
+from recording import open_recording
+from analysis import analyze_recording
+from feature_cache import FeatureCache
+from profiling import probe
 from gamification.corsi import CorsiGame
 
+# Rejilla completa del espectrograma en la reproducción offline (lineal, 1–100 Hz)
+OFFLINE_SPEC_BAND = (1.0, 100.0)
+OFFLINE_SPEC_POINTS = 100
+
+# Velocidades de reproducción (None: máxima, una ventana nueva por frame)
+PLAYBACK_SPEEDS = (1, 2, 5, 20, None)
+RENDER_MS = 33   # refresco de pantalla en velocidades > 1x
+
 
 class NPZPlayer:
-    def __init__(self, filename, update_ms=80):
-        # Cargar datos
-        self.data = np.load(filename)
-        self.eeg = self.data['eeg']
-        self.fs = int(self.data['fs'])
-        self.n_ch = int(self.data['channels'])
+    def __init__(self, filename, update_ms=80, cache=True):
+        # Abrir datos sin cargarlos (memmap; un .npz antiguo se convierte antes)
+        self.filename = filename
+        self.reader = open_recording(filename)
+        self.meta = self.reader.meta
+        self.fs = self.reader.fs
+        self.n_ch = self.reader.n_ch
 
         # Parámetros de la sesión original
-        self.theta_band = tuple(self.data['theta_band']) if 'theta_band' in self.data else (4.0, 8.0)
-        self.gamma_band = tuple(self.data['gamma_band']) if 'gamma_band' in self.data else (30.0, 100.0)
-        self.mode = str(self.data['mode']) if 'mode' in self.data else "butterworth"
-        self.win_sec = int(self.data['win_sec']) if 'win_sec' in self.data else 10
+        self.theta_band = tuple(self.meta.get('theta_band', (4.0, 8.0)))
+        self.gamma_band = tuple(self.meta.get('gamma_band', (30.0, 100.0)))
+        self.mode = str(self.meta.get('mode', "butterworth"))
+        self.win_sec = int(self.meta.get('win_sec', 10))
 
         # Configuración de reproducción
         self.update_ms = update_ms
@@ -32,137 +47,197 @@ class NPZPlayer:
         self.offset = 250
         self.eps = 1e-12
 
+        # Línea temporal de características (caché en disco: reabrir es instantáneo)
+        self.cache = FeatureCache() if cache else None
+        self.timeline = None
+        self._preview = None
+
         # Estado de reproducción
         self.cursor_pos = 0
         self.simulated_time = 0.0
         self.is_playing = True
+        self.speed = 1
+        self._carry = 0.0
 
-        # Buffers idénticos a main.py
-        self.buffers = [deque([0.0] * self.win_samples, maxlen=self.win_samples)
-                        for _ in range(self.n_ch)]
+        # Buffer circular idéntico a main.py
+        self.buffer = RingBuffer(self.n_ch, self.win_samples, dtype=np.float64)
+
+        # Mismo motor de características que main.py (CWT completa, misma definición que la línea temporal)
+        self.engine = FeatureEngine(self.fs, self.n_ch, self.win_sec, self.theta_band,
+                                    self.gamma_band, mode=self.mode, eps=self.eps,
+                                    spec_freqs=offline_spec_freqs(self.fs), sliding=False)
 
         print(f"Reproduciendo: {filename}")
         print(f"Configuración: {self.n_ch} canales, {self.fs} Hz, {self.win_sec}s ventana")
         print(f"Modo: {self.mode}, Theta: {self.theta_band}, Gamma: {self.gamma_band}")
-        print(f"Duración total: {self.eeg.shape[1] / self.fs:.1f}s, Chunk: {self.chunk_size} muestras")
-
-
-def compute_tg_ratio(theta_power, gamma_power, eps=1e-12):
-    """Calcula el ratio normalizado Theta/Gamma"""
-    return theta_power / (theta_power + gamma_power + eps)
-
-
-def update_loop_offline(buffers, fs, theta_band, gamma_band, eps,
-                        ui, ch_idx, win_sec, offset, mode, simulated_time):
-    """
-    Versión offline de update_loop que replica EXACTAMENTE el comportamiento
-    del procesamiento en tiempo real pero usando tiempo simulado
-    """
-    # Eje temporal basado en tiempo simulado
-    t_axis = np.linspace(simulated_time - win_sec, simulated_time, len(buffers[0]))
-
-    # Parámetros de frecuencia para wavelet (deben coincidir con los de plotting.py)
-    freqs = np.linspace(1, 100, 100)  # Mismo que en create_ui
-    theta_mask = (freqs >= theta_band[0]) & (freqs <= theta_band[1])
-    gamma_mask = (freqs >= gamma_band[0]) & (freqs <= gamma_band[1])
-
-    # --- 1) Señales crudas ---
-    for i, curve in enumerate(ui['curves_raw']):
-        sig = np.array(buffers[i])
-        curve.setData(t_axis, sig + i * offset)
-
-    # Resultados agregados
-    theta_pows, gamma_pows, ratios = [], [], []
-
-    # --- Procesar cada canal ---
-    for i in range(len(buffers)):
-        raw_win = np.array(buffers[i])
-
-        # Solo procesar si tenemos datos suficientes
-        if len(raw_win) < win_sec * fs * 0.8:  # Esperar hasta tener al menos 80% de ventana
-            theta_pows.append(0.0)
-            gamma_pows.append(0.0)
-            ratios.append(0.5)  # Valor neutral
-            continue
-
-        raw_win = preprocess_signal(raw_win, fs=fs)
-
-        if mode == 'butterworth':
-            # Ganancia de banda
-            gdb_theta = check_bandpass_gain(*theta_band, fs=fs)
-            gdb_gamma = check_bandpass_gain(*gamma_band, fs=fs)
-
-            # Filtrado Butterworth
-            theta_filt = bandpass_sos(raw_win, *theta_band, fs=fs)
-            gamma_filt = bandpass_sos(raw_win, *gamma_band, fs=fs)
-
-            # Corrección de ganancia
-            theta_filt /= (10 ** (gdb_theta / 20) + 1e-12)
-            gamma_filt /= (10 ** (gdb_gamma / 20) + 1e-12)
-
-            # Envolventes Hilbert
-            theta_env = envelope(theta_filt)
-            gamma_env = envelope(gamma_filt)
-
-            # Potencias (usando ventana completa)
-            theta_power = np.mean(theta_env ** 2)
-            gamma_power = np.mean(gamma_env ** 2)
-
-            ui["p_filt"].setLabel('left', 'Amplitud (µV)')
-
-        else:  # === mode == 'wavelet' ===
-            power_norm = compute_wavelet(raw_win, fs, freqs)
-            theta_env = np.sqrt(np.mean(power_norm[theta_mask, :], axis=0))
-            gamma_env = np.sqrt(np.mean(power_norm[gamma_mask, :], axis=0))
-
-            theta_power = np.mean(theta_env ** 2)
-            gamma_power = np.mean(gamma_env ** 2)
-
-            ui["p_filt"].setLabel('left', 'Amplitud Media (µV)')
-
-        # Guardar para barras y ratio
-        theta_pows.append(theta_power)
-        gamma_pows.append(gamma_power)
-        ratio_val = compute_tg_ratio(theta_power, gamma_power, eps)
-        ratios.append(ratio_val)
-
-        # --- Señal filtrada del canal seleccionado ---
-        if i == ch_idx:
-            ui["p_filt"].setTitle(f"Señal filtrada {mode} (Canal {ch_idx + 1})")
-            if mode == 'butterworth':
-                ui['curve_theta'].setData(t_axis, theta_filt)
-                ui['curve_gamma'].setData(t_axis, gamma_filt)
-            else:
-                ui['curve_theta'].setData(t_axis, theta_env)
-                ui['curve_gamma'].setData(t_axis, gamma_env)
-
-            # Espectrograma wavelet
-            if mode == 'wavelet':
-                spec_db = 10 * np.log10(np.clip(power_norm.T, 1e-18, None)).astype(np.float32)
-                ui['p_cwt'].setTitle(f"Espectrograma Wavelet (Canal {ch_idx + 1})")
-                update_wavelet_plot(ui, spec_db, freqs, win_sec)
-
-    # --- 2) Barras de potencia ---
-    ui['bar_theta'].setOpts(height=np.array(theta_pows))
-    ui['bar_gamma'].setOpts(height=np.array(gamma_pows))
-
-    # --- 3) Ratio global ---
-    current_ratio = np.median(ratios)
-
-    # Actualizar buffer de ratio (igual que en tiempo real)
-    ui['ratio_t'].append(simulated_time)
-    ui['ratio_y'].append(current_ratio)
-
-    # Mantener solo últimos 30 segundos en el plot
-    keep_mask = np.array(ui['ratio_t']) >= max(0, simulated_time - 30)
-    ui['ratio_t'] = list(np.array(ui['ratio_t'])[keep_mask])
-    ui['ratio_y'] = list(np.array(ui['ratio_y'])[keep_mask])
-
-    ui['curve_ratio'].setData(ui['ratio_t'], ui['ratio_y'])
-    ui['p_ratio'].setXRange(max(0, simulated_time - 30), simulated_time)
-    ui['p_ratio'].setYRange(0, 1)
-
-    return current_ratio
+        print(f"Duración total: {self.reader.duration:.1f}s, Chunk: {self.chunk_size} muestras")
+
+    @property
+    def n_samples(self):
+        return self.reader.n_samples
+
+    def seek(self, seconds):
+        """
+        Salta a `seconds` de la sesión sin reproducir los ticks intermedios:
+        carga en el buffer la ventana que termina en ese punto y reinicia el
+        estado incremental del motor. La posición se ajusta a la rejilla de
+        chunks (la de la línea temporal). Devuelve la nueva posición (muestra).
+        """
+        pos = int(round(seconds * self.fs / self.chunk_size)) * self.chunk_size
+        pos = int(np.clip(pos, 0, self.n_samples))
+        self.buffer.clear()
+        self.engine.reset()
+        self.buffer.extend(self.reader.read(pos - self.win_samples, pos))
+        self.cursor_pos = pos
+        self.simulated_time = pos / self.fs
+        return pos
+
+    def window_at(self, pos):
+        """Ventana cruda (N_CH, win_samples) que termina en `pos`, con ceros antes del inicio."""
+        window = self.reader.read(pos - self.win_samples, pos)
+        missing = self.win_samples - window.shape[1]
+        if missing:
+            window = np.concatenate([np.zeros((self.n_ch, missing)), window], axis=1)
+        return window
+
+    def preview_frame(self, pos, ch_sel=0, want_spec=True):
+        """
+        (ventana, FeatureFrame) en la muestra `pos` sin tocar el buffer ni el
+        estado incremental (arrastre de la línea temporal). Potencias y ratio
+        salen de la línea temporal; solo el canal seleccionado se procesa
+        (ver _selected_frame).
+        """
+        window = self.window_at(pos)
+        frame = self._selected_frame(window, pos, ch_sel, want_spec)
+        self.apply_timeline(frame, pos / self.fs)
+        return window, frame
+
+    def _selected_frame(self, window, total_written, ch_sel, want_spec):
+        # Trazas y espectrograma solo del canal seleccionado, con un motor de
+        # 1 canal sin estado; potencias y ratio quedan para apply_timeline.
+        # En modo streaming las trazas son las de butterworth.
+        if self._preview is None:
+            mode = 'butterworth' if self.mode == 'streaming' else self.mode
+            self._preview = FeatureEngine(self.fs, 1, self.win_sec, self.theta_band, self.gamma_band,
+                                          mode=mode, eps=self.eps, sliding=False,
+                                          spec_freqs=self.engine.spec_freqs)
+        sel = self._preview.process(window[ch_sel:ch_sel + 1], want_spec=want_spec)
+        return FeatureFrame(mode=self.mode, ch_sel=ch_sel,
+                            theta_pows=np.zeros(self.n_ch), gamma_pows=np.zeros(self.n_ch),
+                            ratios=np.zeros(self.n_ch), ratio=sel.ratio,
+                            theta_trace=sel.theta_trace, gamma_trace=sel.gamma_trace,
+                            spec=sel.spec, spec_freqs=sel.spec_freqs, total_written=total_written)
+
+    def apply_timeline(self, frame, seconds):
+        """
+        Única fuente de potencias y ratio en la reproducción: sustituye los
+        del frame por los de la línea temporal (misma definición que el
+        motor) en la última ventana que termina en `seconds`. Sin línea
+        temporal, o antes de la primera ventana, el frame no cambia.
+        """
+        i = self.timeline.at(seconds) if self.timeline is not None else -1
+        if i >= 0:
+            frame.theta_pows = self.timeline.theta_pows[i]
+            frame.gamma_pows = self.timeline.gamma_pows[i]
+            frame.ratios = self.timeline.ratios[i]
+            frame.ratio = float(self.timeline.ratio[i])
+        return frame
+
+    def tick_frame(self, ch_sel=0, want_spec=True):
+        """
+        (ventana, FeatureFrame) del buffer actual: potencias y ratio salen de
+        la línea temporal y, si ya cubre este instante, solo se calculan las
+        trazas y el espectrograma del canal seleccionado (como preview_frame).
+        Sin ella, o en modo streaming (estado causal de todos los canales,
+        coste por muestra nueva), se procesa la ventana completa con el motor.
+        """
+        window, total_written = self.buffer.snapshot(self.win_samples)
+        covered = self.timeline is not None and self.timeline.at(self.simulated_time) >= 0
+        if covered and self.mode != 'streaming':
+            frame = self._selected_frame(window, total_written, ch_sel, want_spec)
+        else:
+            frame = self.engine.process(window, total_written, ch_sel=ch_sel, want_spec=want_spec)
+        return window, self.apply_timeline(frame, self.simulated_time)
+
+    def set_speed(self, speed):
+        """Cambia la velocidad (ver PLAYBACK_SPEEDS)."""
+        self.speed = speed
+        self._carry = 0.0
+
+    def timer_ms(self):
+        """Intervalo del temporizador: un chunk por tick a 1x; refresco de pantalla si no."""
+        return self.update_ms if self.speed == 1 else RENDER_MS
+
+    def advance(self, elapsed_s):
+        """
+        Avanza el cursor lo que corresponde a `elapsed_s` segundos reales a la
+        velocidad actual (en chunks enteros; el resto se acumula) y carga en
+        el buffer solo las muestras que caben en la ventana. Los chunks
+        intermedios no se procesan: sus características están en la línea
+        temporal (ver apply_timeline). Devuelve las muestras avanzadas.
+        """
+        if self.speed is None:
+            step = self.win_samples
+        else:
+            self._carry += self.speed * elapsed_s * self.fs
+            step = int(self._carry // self.chunk_size) * self.chunk_size
+            self._carry -= step
+        end = min(self.cursor_pos + step, self.n_samples)
+        self.buffer.extend(self.reader.read(max(self.cursor_pos, end - self.win_samples), end))
+        step, self.cursor_pos = end - self.cursor_pos, end
+        self.simulated_time = end / self.fs
+        return step
+
+    def load_timeline(self, background=False):
+        """
+        Características de toda la sesión con los parámetros del reproductor
+        (hop = update_ms) y la misma definición que el motor, en una sola
+        pasada (segundos por hora de grabación). Se calculan una vez y se
+        guardan en la caché; con background=True se calculan en un hilo y
+        self.timeline queda en None hasta que terminan (mientras tanto el
+        motor procesa cada tick completo).
+        """
+        if background:
+            thread = threading.Thread(target=self.load_timeline, name="TimelineLoader", daemon=True)
+            thread.start()
+            return thread
+
+        t0 = time.perf_counter()
+        last = {"p": 0.0}
+
+        def progress(frac):
+            if frac - last["p"] >= 0.1 or frac >= 1.0:
+                last["p"] = frac
+                print(f"Línea temporal: {frac * 100:.0f}%")
+
+        timeline = analyze_recording(self.filename, hop_ms=self.update_ms, win_sec=self.win_sec,
+                                     mode=self.mode, theta_band=self.theta_band,
+                                     gamma_band=self.gamma_band, eps=self.eps, cache=self.cache,
+                                     progress=progress)
+        self.timeline = timeline
+        source = "caché" if self.cache is not None and self.cache.hits else "calculada"
+        print(f"Línea temporal: {len(timeline)} ventanas ({source}, "
+              f"{time.perf_counter() - t0:.2f}s)")
+        return timeline
+
+    def ratio_history(self, seconds, span=30.0):
+        """
+        (t, ratio) de la línea temporal en (seconds - span, seconds), sin la
+        ventana actual (la añade el render con el ratio del frame).
+        """
+        if self.timeline is None:
+            return np.empty(0), np.empty(0)
+        tl = self.timeline
+        i1 = max(tl.at(seconds), 0)
+        i0 = min(int(np.searchsorted(tl.t, seconds - span, side="right")), i1)
+        return tl.t[i0:i1], tl.ratio[i0:i1]
+
+
+def offline_spec_freqs(fs):
+    """Rejilla completa del espectrograma offline, recortada a Nyquist."""
+    freqs, _ = plan_frequency_grid(fs, {"spec": OFFLINE_SPEC_BAND},
+                                   n_per_band=OFFLINE_SPEC_POINTS, spacing='linear')
+    return freqs
 
 
 def main():
@@ -170,14 +245,15 @@ def main():
 
     # Seleccionar archivo
     filename, _ = QtWidgets.QFileDialog.getOpenFileName(
-        None, "Seleccionar archivo de grabación", "recordings", "NPZ files (*.npz)")
+        None, "Seleccionar archivo de grabación", "recordings", "Grabaciones (*.json *.npz)")
 
     if not filename:
         print("No se seleccionó ningún archivo")
         sys.exit(0)
 
-    # Inicializar reproductor
+    # Inicializar reproductor (la línea temporal se carga o calcula en segundo plano)
     player = NPZPlayer(filename)
+    player.load_timeline(background=True)
 
     # UI idéntica a main.py
     pg.setConfigOptions(antialias=True, background='#111218', foreground='w')
@@ -192,57 +268,130 @@ def main():
 
     # Timer para updates
     timer = QtCore.QTimer()
+    time_label = QtWidgets.QLabel("")
+
+    # Línea de tiempo (décimas de segundo) para saltar a cualquier punto
+    slider = QtWidgets.QSlider(QtCore.Qt.Horizontal)
+    slider.setRange(0, int(player.reader.duration * 10))
+
+    def set_slider(pos):
+        slider.blockSignals(True)
+        slider.setValue(int(pos / player.fs * 10))
+        slider.blockSignals(False)
+
+    def render_now():
+        # Frame del buffer actual con eje temporal simulado; potencias, ratio
+        # e historial vienen de la línea temporal si ya está disponible
+        window, frame = player.tick_frame(ch_sel["idx"], want_spec=ui['chk_spec'].isChecked())
+        if player.timeline is not None:
+            fill_ratio_history()
+        t_now = player.simulated_time
+        t_axis = np.linspace(t_now - player.win_sec, t_now, player.win_samples)
+        with probe('render'):
+            render_frame(ui, frame, window, t_now, player.offset, t_axis=t_axis)
+        show_time(frame.ratio)
+        return frame.ratio
+
+    def show_time(ratio, pos=None):
+        pos = player.cursor_pos if pos is None else pos
+        wall = datetime.fromtimestamp(float(player.reader.wall_time(pos)))
+        progress = (pos / max(player.n_samples, 1)) * 100
+        time_label.setText(f"Tiempo: {pos / player.fs:.1f}s ({wall:%H:%M:%S}) | "
+                           f"Progreso: {progress:.1f}% | Ratio: {ratio:.3f}")
+
+    def fill_ratio_history(seconds=None):
+        # Historial del ratio desde la línea temporal (sin reproducir ticks);
+        # el último punto lo añade el propio render
+        seconds = player.simulated_time if seconds is None else seconds
+        t_hist, y_hist = player.ratio_history(seconds)
+        ui['ratio_t'].clear()
+        ui['ratio_y'].clear()
+        ui['ratio_t'].extend(t_hist.tolist())
+        ui['ratio_y'].extend(y_hist.tolist())
+
+    def seek(seconds):
+        player.seek(seconds)
+        fill_ratio_history()
+        set_slider(player.cursor_pos)
+        render_now()
+
+    last_scrub = {"t": 0.0}
+
+    def scrub(seconds):
+        # Vista previa durante el arrastre (a lo sumo una por refresco de pantalla)
+        now = time.perf_counter()
+        if now - last_scrub["t"] < RENDER_MS / 1000.0:
+            return
+        last_scrub["t"] = now
+        pos = int(np.clip(round(seconds * player.fs), 0, player.n_samples))
+        window, frame = player.preview_frame(pos, ch_sel["idx"], want_spec=ui['chk_spec'].isChecked())
+        t_now = pos / player.fs
+        fill_ratio_history(t_now)
+        render_frame(ui, frame, window, t_now, player.offset,
+                     t_axis=np.linspace(t_now - player.win_sec, t_now, player.win_samples))
+        show_time(frame.ratio, pos)
 
     def update():
-        if not player.is_playing or player.cursor_pos >= player.eeg.shape[1]:
-            if player.cursor_pos >= player.eeg.shape[1]:
+        if not player.is_playing or player.cursor_pos >= player.n_samples:
+            if player.cursor_pos >= player.n_samples:
                 print("✓ Fin de la grabación")
                 player.is_playing = False
-                if hasattr(ui, 'time_label'):
-                    ui.time_label.setText("✓ Grabación completada")
+                time_label.setText("✓ Grabación completada")
             timer.stop()
             return
+        if player.speed != 1:
+            fast_update()
+            return
 
         # Obtener chunk actual
         end_pos = player.cursor_pos + player.chunk_size
-        if end_pos > player.eeg.shape[1]:
-            end_pos = player.eeg.shape[1]
+        if end_pos > player.n_samples:
+            end_pos = player.n_samples
             player.is_playing = False
 
-        chunk = player.eeg[:, player.cursor_pos:end_pos]
+        chunk = player.reader.read(player.cursor_pos, end_pos)
 
-        # Actualizar buffers (EXACTAMENTE como en main.py)
-        for i in range(player.n_ch):
-            player.buffers[i].extend(chunk[i])
+        # Actualizar buffer (EXACTAMENTE como en main.py)
+        player.buffer.extend(chunk)
 
-        # Calcular tiempo simulado
-        player.simulated_time = player.cursor_pos / player.fs
+        # Tiempo simulado = fin de la ventana (mismo instante que la línea temporal)
+        player.cursor_pos = end_pos
+        player.simulated_time = end_pos / player.fs
 
-        # Procesamiento offline específico
-        ratio = update_loop_offline(
-            player.buffers, player.fs, player.theta_band, player.gamma_band,
-            player.eps, ui, ch_sel["idx"], player.win_sec,
-            player.offset, player.mode, player.simulated_time
-        )
+        # Mismo tick que en tiempo real, con eje temporal simulado
+        ratio = render_now()
 
         # Enviar ratio al juego (igual que en main.py)
         if ratio is not None and np.isfinite(ratio):
             game.set_brain_ratio(ratio)
 
         # Actualizar UI
-        player.cursor_pos = end_pos
-        progress = (player.cursor_pos / player.eeg.shape[1]) * 100
+        if not slider.isSliderDown():
+            set_slider(player.cursor_pos)
+
+    last_tick = {"t": time.perf_counter()}
 
-        if hasattr(ui, 'time_label'):
-            ui.time_label.setText(
-                f"Tiempo: {player.simulated_time:.1f}s | "
-                f"Progreso: {progress:.1f}% | "
-                f"Ratio: {ratio:.3f}" if ratio is not None else "Calculando..."
-            )
+    def fast_update():
+        # Velocidad > 1x: varios chunks por tick y un solo render por refresco
+        now = time.perf_counter()
+        elapsed, last_tick["t"] = now - last_tick["t"], now
+        if player.advance(elapsed) == 0:
+            return
+        if player.cursor_pos >= player.n_samples:
+            player.is_playing = False
+        ratio = render_now()
+        if ratio is not None and np.isfinite(ratio):
+            game.set_brain_ratio(ratio)
+        if not slider.isSliderDown():
+            set_slider(player.cursor_pos)
+
+    def start_timer():
+        last_tick["t"] = time.perf_counter()
+        timer.start(player.timer_ms())
 
     # Configurar timer
     timer.timeout.connect(update)
-    timer.start(player.update_ms)
+    start_timer()
 
     # Botones de control
     control_widget = QtWidgets.QWidget()
@@ -254,31 +403,65 @@ def main():
 
     def play():
         player.is_playing = True
-        timer.start(player.update_ms)
+        start_timer()
 
     def pause():
         player.is_playing = False
         timer.stop()
 
     def restart():
-        player.cursor_pos = 0
-        player.simulated_time = 0.0
-        # Reiniciar buffers
-        player.buffers = [deque([0.0] * player.win_samples, maxlen=player.win_samples)
-                          for _ in range(player.n_ch)]
-        # Reiniciar buffers de ratio en UI
-        ui['ratio_t'].clear()
-        ui['ratio_y'].clear()
+        # Reiniciar buffer, motor e historial de ratio
+        seek(0)
         player.is_playing = True
-        timer.start(player.update_ms)
+        start_timer()
+
+    # Velocidad de reproducción
+    cmb_speed = QtWidgets.QComboBox()
+    for speed in PLAYBACK_SPEEDS:
+        cmb_speed.addItem(f"{speed}x" if speed else "máx", speed)
+
+    def set_speed(i):
+        player.set_speed(cmb_speed.itemData(i))
+        if timer.isActive():
+            start_timer()
+    cmb_speed.currentIndexChanged.connect(set_speed)
 
     btn_play.clicked.connect(play)
     btn_pause.clicked.connect(pause)
     btn_restart.clicked.connect(restart)
 
+    # Arrastrar: vista previa inmediata y salto al soltar; clic o teclado: salto inmediato.
+    # Durante el arrastre la reproducción se detiene (si no, su frame alternaría
+    # con la vista previa) y se reanuda tras el salto
+    def release():
+        seek(slider.value() / 10)
+        if player.is_playing:
+            start_timer()
+
+    slider.sliderPressed.connect(timer.stop)
+    slider.sliderReleased.connect(release)
+    slider.valueChanged.connect(lambda v: scrub(v / 10) if slider.isSliderDown() else seek(v / 10))
+
     control_layout.addWidget(btn_play)
     control_layout.addWidget(btn_pause)
     control_layout.addWidget(btn_restart)
+    control_layout.addWidget(cmb_speed)
+
+    # Marcadores de la grabación (salto directo)
+    if player.reader.events:
+        cmb_events = QtWidgets.QComboBox()
+        cmb_events.addItem("Eventos…")
+        for ev in player.reader.events:
+            cmb_events.addItem(f"{ev['label']} ({ev['sample'] / player.fs:.1f}s)", ev['sample'])
+
+        def jump_to_event(i):
+            if i > 0:
+                seek(cmb_events.itemData(i) / player.fs)
+        cmb_events.activated.connect(jump_to_event)
+        control_layout.addWidget(cmb_events)
+
+    control_layout.addWidget(slider, stretch=1)
+    control_layout.addWidget(time_label)
 
     # Layout principal
     main_layout = QtWidgets.QVBoxLayout()
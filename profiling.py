@@ -0,0 +1,107 @@
+# profiling.py
+import csv
+import json
+import time
+import threading
+from collections import deque
+from contextlib import nullcontext
+import numpy as np
+
+# Muestras conservadas por etapa (ventana móvil para los percentiles)
+PROFILE_HISTORY = 2000
+
+_NULL_PROBE = nullcontext()
+
+
+class _Probe:
+    """Context manager que mide una etapa y la registra en su StageTimer."""
+    __slots__ = ("timer", "name", "t0")
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.record(self.name, (time.perf_counter() - self.t0) * 1000.0)
+        return False
+
+
+class StageTimer:
+    """
+    Tiempos por etapa del pipeline en tiempo real (ms).
+
+    Cada etapa guarda sus últimas `history` duraciones; summary() calcula
+    p50/p95/p99 sobre esa ventana móvil. Desactivado, probe() devuelve un
+    nullcontext compartido (sin medir ni reservar memoria).
+
+        with STAGES.probe('render'):
+            ...
+    """
+
+    def __init__(self, enabled=False, history=PROFILE_HISTORY):
+        self.enabled = enabled
+        self.history = int(history)
+        self._samples = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def probe(self, name):
+        if not self.enabled:
+            return _NULL_PROBE
+        return _Probe(self, name)
+
+    def record(self, name, ms):
+        # Las etapas se registran desde varios hilos (adquisición, pool de FeatureEngine)
+        with self._lock:
+            if name not in self._samples:
+                self._samples[name] = deque(maxlen=self.history)
+                self._counts[name] = 0
+            self._samples[name].append(ms)
+            self._counts[name] += 1
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+
+    def summary(self):
+        """{etapa: {count, mean_ms, p50_ms, p95_ms, p99_ms, max_ms}} sobre la ventana móvil."""
+        with self._lock:
+            items = [(name, np.array(d), self._counts[name]) for name, d in self._samples.items()]
+        out = {}
+        for name, ms, count in items:
+            if ms.size == 0:
+                continue
+            p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+            out[name] = {"count": count, "mean_ms": float(ms.mean()),
+                         "p50_ms": float(p50), "p95_ms": float(p95),
+                         "p99_ms": float(p99), "max_ms": float(ms.max())}
+        return out
+
+    def export(self, path):
+        """Escribe summary() en CSV o JSON según la extensión de path."""
+        summary = self.summary()
+        if path.endswith(".json"):
+            with open(path, "w") as f:
+                json.dump(summary, f, indent=2)
+        else:
+            fields = ["count", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["stage"] + fields)
+                for name, row in summary.items():
+                    writer.writerow([name] + [row[k] for k in fields])
+        return path
+
+
+# Temporizador del proceso (desactivado por defecto; main.py lo activa)
+STAGES = StageTimer()
+
+
+def probe(name):
+    """Atajo de STAGES.probe(name)."""
+    return STAGES.probe(name)
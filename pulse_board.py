@@ -0,0 +1,102 @@
+# pulse_board.py
+import time
+import numpy as np
+
+
+class PulseBoard:
+    """
+    Board de prueba en Python puro con la misma interfaz que BoardShim
+    (prepare_session, start_stream, get_board_data, ...), sin hardware ni
+    BrainFlow. Sirve para medir latencias de extremo a extremo en CI.
+
+    La señal de cada canal es ruido + gamma de fondo; a partir de cada
+    inicio de ráfaga se suma una oscilación theta de `burst_dur` segundos,
+    por lo que el ratio θ/(θ+γ) sube de forma conocida. Las muestras se
+    generan según el reloj: una muestra solo está disponible cuando llega
+    su instante nominal (t_inicio + índice / fs).
+
+    Filas de get_board_data (como la Synthetic Board):
+      0: contador de paquete, 1..n_ch: EEG (µV), n_ch + 1: timestamp (s, time.time()).
+
+    - burst_period / burst_dur / first_burst: calendario de ráfagas (s)
+    - theta_hz / theta_uv: ráfaga; gamma_hz / gamma_uv: fondo; noise_uv: ruido
+    """
+
+    BOARD_ID = -100   # fuera del rango de BoardIds de BrainFlow
+
+    def __init__(self, fs=250, n_ch=8, burst_period=7.0, burst_dur=2.0, first_burst=None,
+                 theta_hz=6.0, theta_uv=40.0, gamma_hz=40.0, gamma_uv=10.0, noise_uv=2.0, seed=0):
+        self.fs = fs
+        self.n_ch = n_ch
+        self.burst_period = burst_period
+        self.burst_dur = burst_dur
+        self.first_burst = burst_period if first_burst is None else first_burst
+        self.theta_hz, self.theta_uv = theta_hz, theta_uv
+        self.gamma_hz, self.gamma_uv = gamma_hz, gamma_uv
+        self.noise_uv = noise_uv
+        self._rng = np.random.default_rng(seed)
+        self._phase = self._rng.uniform(0, 2 * np.pi, (n_ch, 1))
+
+        self.t_start = None      # time.time() de la muestra 0
+        self._next = 0           # índice de la próxima muestra a entregar
+        self._streaming = False
+
+    # ---- Interfaz tipo BoardShim ----
+    def prepare_session(self):
+        pass
+
+    def start_stream(self, *args):
+        self.t_start = time.time()
+        self._next = 0
+        self._streaming = True
+
+    def stop_stream(self):
+        self._streaming = False
+
+    def release_session(self):
+        self._streaming = False
+
+    def get_board_id(self):
+        return self.BOARD_ID
+
+    def get_eeg_channels(self, board_id=None):
+        return list(range(1, self.n_ch + 1))
+
+    def get_timestamp_channel(self, board_id=None):
+        return self.n_ch + 1
+
+    def get_sampling_rate(self, board_id=None):
+        return self.fs
+
+    def get_board_data(self):
+        """Devuelve (y consume) las muestras cuyo instante nominal ya pasó."""
+        if not self._streaming:
+            return np.zeros((self.n_ch + 2, 0))
+        available = int((time.time() - self.t_start) * self.fs) + 1
+        idx = np.arange(self._next, available)
+        self._next = available
+
+        data = np.empty((self.n_ch + 2, idx.size))
+        data[0] = idx % 256
+        data[1:self.n_ch + 1] = self.signal(idx)
+        data[self.n_ch + 1] = self.t_start + idx / self.fs
+        return data
+
+    # ---- Señal y calendario ----
+    def burst_mask(self, idx):
+        """True para las muestras (índices) dentro de una ráfaga theta."""
+        t = idx / self.fs - self.first_burst
+        return (t >= 0) & (np.mod(t, self.burst_period) < self.burst_dur)
+
+    def signal(self, idx):
+        """Señal (n_ch, len(idx)) en µV para los índices de muestra idx."""
+        t = idx / self.fs
+        x = self.gamma_uv * np.sin(2 * np.pi * self.gamma_hz * t + self._phase)
+        x = x + self.noise_uv * self._rng.standard_normal((self.n_ch, idx.size))
+        theta = self.theta_uv * np.sin(2 * np.pi * self.theta_hz * t + self._phase)
+        return x + theta * self.burst_mask(idx)
+
+    def burst_onsets(self, until_s):
+        """Instantes (time.time()) de inicio de las ráfagas hasta until_s segundos de stream."""
+        onsets = np.arange(self.first_burst, until_s, self.burst_period)
+        return self.t_start + onsets
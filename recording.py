@@ -0,0 +1,529 @@
+# recording.py
+import os
+import sys
+import json
+import argparse
+import time
+import queue
+import threading
+import numpy as np
+
+from profiling import probe
+
+# Formato de grabación append-only:
+#   <base>.json → cabecera (fs, canales, dtype, parámetros de la sesión)
+#   <base>.raw  → muestras crudas intercaladas (n_muestras × n_canales), C-order,
+#                 codificadas según el codec de la cabecera (SampleCodec)
+#   <base>.idx  → índice muestra ↔ timestamp de BrainFlow ↔ reloj (INDEX_DTYPE)
+#   <base>.events.jsonl → marcadores de eventos {"sample", "wall", "label"}
+# El número de muestras se deduce del tamaño del .raw, así que el archivo
+# puede leerse mientras se sigue escribiendo.
+RAW_FORMAT = "nfb-raw"
+RAW_VERSION = 1
+CODECS = ("float32", "int32", "int24")
+# LSB del ADS1299 de Cyton en µV: Vref 4.5 V / ganancia 24 / (2^23 - 1)
+CYTON_LSB_UV = 4.5 / 24 / (2 ** 23 - 1) * 1e6
+INDEX_DTYPE = np.dtype([("sample", "<i8"), ("board_ts", "<f8"), ("wall", "<f8")])
+
+WRITER_QUEUE_CHUNKS = 512   # chunks en cola antes de descartar (≈10 s a 20 ms/poll)
+INDEX_INTERVAL_S = 1.0      # separación mínima entre entradas del índice
+
+
+def recording_paths(path):
+    """(cabecera .json, datos .raw) de una grabación; path puede ser la base o cualquiera de los dos."""
+    base = os.path.splitext(path)[0] if path.endswith((".json", ".raw")) else path
+    return base + ".json", base + ".raw"
+
+
+class SampleCodec:
+    """
+    Codificación de bloques (n, N_CH) en µV ↔ bytes del .raw (vectorizada).
+
+    - float32: µV en float32 (4 B/valor, por defecto)
+    - int32 / int24: round(µV / scale[ch]) en enteros de 4 o 3 bytes, con
+      scale por canal en la cabecera. Sin pérdida a la resolución del ADC
+      cuando scale es su LSB (Cyton: CYTON_LSB_UV); int24 cubre el rango
+      completo del ADC de 24 bits y ocupa 3/8 del float64 original.
+    """
+
+    def __init__(self, codec="float32", n_ch=1, scale=None):
+        if codec not in CODECS:
+            raise ValueError(f"Codec desconocido: {codec}")
+        self.name = codec
+        self.n_ch = int(n_ch)
+        self.scale = None
+        if codec != "float32":
+            scale = CYTON_LSB_UV if scale is None else scale
+            self.scale = np.broadcast_to(np.asarray(scale, dtype=np.float64), (self.n_ch,)).copy()
+        if codec == "int24":
+            self._dtype, self._tail = np.dtype(np.uint8), (3,)
+        else:
+            self._dtype, self._tail = np.dtype("<f4" if codec == "float32" else "<i4"), ()
+        self.sample_bytes = self.n_ch * self._dtype.itemsize * (self._tail[0] if self._tail else 1)
+
+    @classmethod
+    def from_header(cls, meta):
+        # Cabeceras sin "codec" (versiones anteriores) son float32
+        return cls(meta.get("codec", "float32"), int(meta["channels"]), meta.get("scale"))
+
+    def header(self):
+        """Campos de la cabecera que describen el codec."""
+        h = {"codec": self.name, "dtype": "int24" if self.name == "int24" else self._dtype.str}
+        if self.scale is not None:
+            h["scale"] = self.scale.tolist()
+        return h
+
+    def encode(self, block):
+        """(n, N_CH) µV → bytes en el orden del .raw."""
+        if self.name == "float32":
+            return np.ascontiguousarray(block, dtype="<f4").tobytes()
+        codes = np.rint(np.asarray(block, dtype=np.float64) / self.scale)
+        if self.name == "int32":
+            return np.clip(codes, -2 ** 31, 2 ** 31 - 1).astype("<i4").tobytes()
+        codes = np.ascontiguousarray(np.clip(codes, -2 ** 23, 2 ** 23 - 1), dtype="<i4")
+        # Los 3 bytes bajos de cada int32 little-endian
+        return np.ascontiguousarray(codes.view(np.uint8).reshape(codes.shape + (4,))[..., :3]).tobytes()
+
+    def memmap(self, path, n):
+        """Vista de solo lectura (n, N_CH[, 3]) de las muestras almacenadas."""
+        shape = (n, self.n_ch) + self._tail
+        if n == 0:
+            # np.memmap no admite archivos vacíos
+            return np.zeros(shape, dtype=self._dtype)
+        return np.memmap(path, dtype=self._dtype, mode="r", shape=shape)
+
+    def decode(self, stored):
+        """Muestras almacenadas (k, N_CH[, 3]) → µV float64 (k, N_CH)."""
+        if self.name == "float32":
+            return stored.astype(np.float64)
+        if self.name == "int24":
+            b = stored.astype(np.int32)
+            codes = b[..., 0] | (b[..., 1] << 8) | (b[..., 2] << 16)
+            codes = codes - ((codes & 0x800000) << 1)   # extensión de signo
+        else:
+            codes = stored
+        return codes * self.scale
+
+
+def recording_base(path):
+    """Ruta base (sin extensión) de una grabación append-only."""
+    return os.path.splitext(recording_paths(path)[0])[0]
+
+
+def is_raw_recording(path):
+    """True si path corresponde a una grabación append-only (.json/.raw)."""
+    header_path, _ = recording_paths(path)
+    return not path.endswith(".npz") and os.path.exists(header_path)
+
+
+def read_header(path):
+    """Cabecera JSON de una grabación append-only."""
+    header_path, _ = recording_paths(path)
+    with open(header_path) as f:
+        return json.load(f)
+
+
+def _npz_meta(data):
+    # Parámetros guardados por las versiones antiguas de main.py
+    meta = {"fs": int(data["fs"]), "channels": int(data["channels"])}
+    for key in ("mode", "win_sec"):
+        if key in data:
+            meta[key] = data[key].item()
+    for key in ("theta_band", "gamma_band"):
+        if key in data:
+            meta[key] = [float(v) for v in data[key]]
+    return meta
+
+
+def _write_blocks(base, meta, codec, blocks):
+    # .raw a partir de bloques (N_CH, k) y luego la cabecera (la grabación
+    # solo es visible como tal cuando está completa)
+    header_path, raw_path = recording_paths(base)
+    n = 0
+    with open(raw_path + ".tmp", "wb") as f:
+        for blk in blocks:
+            f.write(codec.encode(blk.T))
+            n += blk.shape[1]
+    os.replace(raw_path + ".tmp", raw_path)
+    meta = dict(meta, format=RAW_FORMAT, version=RAW_VERSION,
+                layout="samples_x_channels", n_samples=n, **codec.header())
+    with open(header_path, "w") as f:
+        json.dump(meta, f, indent=2)
+    return base
+
+
+def convert_npz(npz_path, base=None, codec="float32", scale=None, block=65536):
+    """
+    Convierte un session_*.npz antiguo al formato append-only.
+    Escribe <base>.json/.raw (por defecto junto al .npz) y devuelve la base.
+    """
+    base = base if base is not None else os.path.splitext(npz_path)[0]
+    data = np.load(npz_path)
+    eeg = data["eeg"]   # el .npz comprimido solo puede leerse entero
+    meta = dict(_npz_meta(data), converted_from=os.path.basename(npz_path))
+    codec = SampleCodec(codec, eeg.shape[0], scale)
+    return _write_blocks(base, meta, codec,
+                         (eeg[:, i:i + block] for i in range(0, eeg.shape[1], block)))
+
+
+def transcode(path, base, codec="int24", scale=None, block=65536):
+    """
+    Reescribe una grabación con otro codec (p. ej. float32 → int24).
+    Copia también el índice temporal y los eventos. Devuelve la nueva base.
+    """
+    reader = RecordingReader(path)
+    meta = {k: v for k, v in reader.meta.items() if k not in ("codec", "dtype", "scale")}
+    codec = SampleCodec(codec, reader.n_ch, scale)
+    _write_blocks(base, meta, codec,
+                  (reader.read(i, i + block) for i in range(0, reader.n_samples, block)))
+    new_base = recording_base(base)
+    reader.index.tofile(new_base + ".idx")
+    with open(new_base + ".events.jsonl", "w") as f:
+        for ev in reader.events:
+            f.write(json.dumps(ev) + "\n")
+    return base
+
+
+def read_index(path):
+    """Índice temporal (array estructurado INDEX_DTYPE); vacío si no existe."""
+    if not os.path.exists(path):
+        return np.zeros(0, dtype=INDEX_DTYPE)
+    n = os.path.getsize(path) // INDEX_DTYPE.itemsize
+    return np.fromfile(path, dtype=INDEX_DTYPE, count=n)
+
+
+def read_events(path):
+    """Marcadores [{sample, wall, label}, ...]; ignora una línea final incompleta."""
+    events = []
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+    return events
+
+
+def open_recording(path):
+    """
+    Abre una grabación como RecordingReader (O(1), sin cargar las muestras).
+    Un .npz se convierte antes al formato append-only (una sola vez).
+    """
+    if path.endswith(".npz"):
+        base = os.path.splitext(path)[0]
+        if not is_raw_recording(base):
+            print(f"[INFO] Convirtiendo {path} al formato .json/.raw")
+            convert_npz(path, base)
+        path = base
+    return RecordingReader(path)
+
+
+def load_recording(path):
+    """
+    Carga una grabación completa en memoria → (eeg (N_CH, n) float64, meta).
+    Para sesiones largas es preferible open_recording (lectura perezosa).
+    """
+    if not is_raw_recording(path):
+        data = np.load(path)
+        return np.asarray(data["eeg"], dtype=np.float64), _npz_meta(data)
+    reader = RecordingReader(path)
+    return reader.read(0, reader.n_samples), reader.meta
+
+
+class RecordingReader:
+    """
+    Lector perezoso de una grabación append-only mediante np.memmap.
+
+    Abrir es O(1) y solo se leen del disco las páginas que se tocan, así
+    que la memoria no crece con la duración de la sesión. Si la grabación
+    sigue escribiéndose, refresh() vuelve a mapear las muestras nuevas.
+
+    - stored: vista (n, N_CH[, 3]) de solo lectura en el formato del codec
+    - read(start, stop): copia float64 (N_CH, stop - start) ya decodificada
+    - windows(size, hop): iterador de ventanas (N_CH, size)
+    - index / events: índice temporal y marcadores (vacíos si no existen)
+    - wall_time / board_time / sample_at_wall: conversiones por el índice
+    """
+
+    def __init__(self, path):
+        self.header_path, self.raw_path = recording_paths(path)
+        base = recording_base(path)
+        self.index_path = base + ".idx"
+        self.events_path = base + ".events.jsonl"
+        self.meta = read_header(path)
+        self.fs = int(self.meta["fs"])
+        self.n_ch = int(self.meta["channels"])
+        self.codec = SampleCodec.from_header(self.meta)
+        self._map = None
+        self.refresh()
+
+    def refresh(self):
+        """Vuelve a mapear el .raw (tras crecer) y relee índice y eventos. Devuelve n_samples."""
+        n = os.path.getsize(self.raw_path) // self.codec.sample_bytes
+        if self._map is None or n != self._map.shape[0]:
+            self._map = self.codec.memmap(self.raw_path, n)
+        self.index = read_index(self.index_path)
+        self.events = read_events(self.events_path)
+        return n
+
+    def _from_index(self, field, samples, default):
+        # Entrada del índice anterior a cada muestra + desplazamiento a fs nominal
+        samples = np.asarray(samples)
+        if self.index.size == 0:
+            return default + samples / self.fs
+        i = np.clip(np.searchsorted(self.index["sample"], samples, side="right") - 1, 0, None)
+        return self.index[field][i] + (samples - self.index["sample"][i]) / self.fs
+
+    def wall_time(self, samples):
+        """Hora (time.time()) de una o varias muestras."""
+        return self._from_index("wall", samples, self.meta.get("start_time", 0.0))
+
+    def board_time(self, samples):
+        """Timestamp de BrainFlow de una o varias muestras (NaN sin índice)."""
+        return self._from_index("board_ts", samples, np.nan)
+
+    def sample_at_wall(self, t):
+        """Muestra más cercana a la hora t (time.time())."""
+        if self.index.size == 0:
+            sample = (t - self.meta.get("start_time", 0.0)) * self.fs
+        else:
+            i = max(0, int(np.searchsorted(self.index["wall"], t, side="right")) - 1)
+            sample = self.index["sample"][i] + (t - self.index["wall"][i]) * self.fs
+        return int(np.clip(round(sample), 0, self.n_samples))
+
+    @property
+    def n_samples(self):
+        return self._map.shape[0]
+
+    @property
+    def duration(self):
+        return self.n_samples / self.fs
+
+    @property
+    def stored(self):
+        return self._map
+
+    def read(self, start, stop):
+        """Muestras [start, stop) de todos los canales como float64 (N_CH, k)."""
+        start, stop = max(0, int(start)), min(int(stop), self.n_samples)
+        return np.ascontiguousarray(self.codec.decode(self._map[start:max(start, stop)]).T)
+
+    def windows(self, size, hop, start=0):
+        """Genera (fin, ventana) con ventanas (N_CH, size) cada `hop` muestras."""
+        for end in range(start + size, self.n_samples + 1, hop):
+            yield end, self.read(end - size, end)
+
+    def close(self):
+        self._map = None
+
+
+class RecordingWriter:
+    """
+    Grabador append-only en un hilo de fondo.
+
+    append(chunk) solo encola (N_CH, k) y nunca bloquea: el hilo escritor
+    codifica (float32 o enteros escalados) y añade los bytes al .raw, así que cada escritura
+    cuesta O(muestras nuevas) y el disco no frena el bucle de la GUI. Si la
+    cola (acotada) se llena, el chunk se descarta y se cuenta en
+    dropped_chunks (y un marcador, en dropped_events). close() vacía la
+    cola y completa la cabecera.
+
+    Junto a las muestras se escribe el índice temporal (.idx, una entrada
+    cada INDEX_INTERVAL_S con muestra, timestamp de BrainFlow y hora) y los
+    marcadores de mark(label) (.events.jsonl), en el orden en que llegan.
+
+    - base: ruta sin extensión (p. ej. recordings/session_<id>)
+    - fs, n_ch: frecuencia y canales
+    - meta: parámetros extra de la sesión (mode, bandas, win_sec, ...)
+    - codec / scale: codificación del .raw (ver SampleCodec)
+    """
+
+    def __init__(self, base, fs, n_ch, meta=None, codec="float32", scale=None,
+                 max_chunks=WRITER_QUEUE_CHUNKS, index_interval_s=INDEX_INTERVAL_S):
+        self.header_path, self.raw_path = recording_paths(base)
+        base = recording_base(base)
+        self.n_ch = int(n_ch)
+        self.codec = SampleCodec(codec, self.n_ch, scale)
+        self.header = {"format": RAW_FORMAT, "version": RAW_VERSION,
+                       "fs": int(fs), "channels": self.n_ch,
+                       "layout": "samples_x_channels", "start_time": time.time()}
+        self.header.update(self.codec.header())
+        self.header.update(meta or {})
+        self._write_header()
+
+        self._file = open(self.raw_path, "wb")
+        self._index_file = open(base + ".idx", "wb")
+        self._events_file = open(base + ".events.jsonl", "w")
+        self._index_every = max(1, int(index_interval_s * fs))
+        self._last_indexed = None
+        self._queue = queue.Queue(maxsize=max_chunks)
+        self.samples_written = 0
+        self.dropped_chunks = 0
+        self.dropped_events = 0
+        self.n_events = 0
+        self._close_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="RecordingWriter", daemon=True)
+        self._thread.start()
+
+    def _write_header(self, **extra):
+        # Escritura atómica: el lector nunca ve una cabecera a medias
+        self.header.update(extra)
+        tmp = self.header_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.header, f, indent=2)
+        os.replace(tmp, self.header_path)
+
+    def append(self, chunk, board_ts=np.nan):
+        """
+        Encola un chunk (N_CH, k) sin bloquear. board_ts: timestamp de
+        BrainFlow de su primera muestra. Devuelve False si se descartó.
+        """
+        if chunk.shape[1] == 0:
+            return True
+        try:
+            self._queue.put_nowait(("data", chunk, float(board_ts), time.time()))
+            return True
+        except queue.Full:
+            self.dropped_chunks += 1
+            return False
+
+    def mark(self, label):
+        """
+        Marcador de evento en la posición actual de la grabación. Devuelve
+        False si se descartó (cola llena).
+        """
+        try:
+            self._queue.put_nowait(("event", str(label), time.time()))
+            return True
+        except queue.Full:
+            self.dropped_events += 1
+            return False
+
+    def _run(self):
+        while True:
+            items = [self._queue.get()]
+            # Agrupar todo lo pendiente en una sola escritura
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            closing = items[-1] is None
+            with probe('recorder'):
+                self._write_items([it for it in items if it is not None])
+            if closing:
+                self._finish()
+                return
+
+    def _write_items(self, items):
+        chunks, index, events = [], [], []
+        offset = self.samples_written
+        for item in items:
+            if item[0] == "event":
+                events.append({"sample": offset, "wall": item[2], "label": item[1]})
+                continue
+            _, chunk, board_ts, wall = item
+            if self._last_indexed is None or offset - self._last_indexed >= self._index_every:
+                index.append((offset, board_ts, wall))
+                self._last_indexed = offset
+            chunks.append(chunk)
+            offset += chunk.shape[1]
+
+        if chunks:
+            self._file.write(self.codec.encode(np.hstack(chunks).T))
+            self._file.flush()
+        # Índice y eventos después de los datos: nunca apuntan a muestras no escritas
+        if index:
+            self._index_file.write(np.array(index, dtype=INDEX_DTYPE).tobytes())
+            self._index_file.flush()
+        for ev in events:
+            self._events_file.write(json.dumps(ev) + "\n")
+        if events:
+            self._events_file.flush()
+        self.samples_written = offset
+        self.n_events += len(events)
+
+    def stats(self):
+        """Contadores del grabador como diccionario."""
+        return {"samples_written": self.samples_written,
+                "pending_chunks": self._queue.qsize(),
+                "dropped_chunks": self.dropped_chunks,
+                "events": self.n_events,
+                "dropped_events": self.dropped_events}
+
+    def _discard_pending(self):
+        # Escritor atascado: descarta lo pendiente (contado como descartado)
+        # hasta que cabe el centinela de cierre
+        while True:
+            try:
+                self._queue.put_nowait(None)
+                return
+            except queue.Full:
+                pass
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                continue
+            if item is not None and item[0] == "event":
+                self.dropped_events += 1
+            elif item is not None:
+                self.dropped_chunks += 1
+
+    def close(self, timeout=5.0):
+        """
+        Escribe lo pendiente, cierra los archivos y anota n_samples en la
+        cabecera. Si en `timeout` no cabe el cierre en la cola, lo pendiente
+        se descarta (ver stats); si el hilo sigue escribiendo, la cabecera
+        se anota con lo ya escrito y el hilo la completa al terminar.
+        """
+        if self._file.closed:
+            return
+        if self._thread.is_alive():
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                self._discard_pending()
+                print(f"[WARN] Grabador sin responder al cerrar: {self.stats()}")
+            self._thread.join(timeout)
+        if self._thread.is_alive():
+            # Sigue dentro de una escritura: cabecera con lo escrito hasta ahora;
+            # el propio hilo cierra los archivos y la completa al terminar
+            print(f"[WARN] Grabador aún escribiendo al cerrar: {self.stats()}")
+            with self._close_lock:
+                if not self._file.closed:
+                    self._write_header(n_samples=self.samples_written, stop_time=time.time())
+            return
+        self._finish()
+
+    def _finish(self):
+        # Cierra los archivos y anota n_samples (una sola vez, desde cualquier hilo)
+        with self._close_lock:
+            if self._file.closed:
+                return
+            for f in (self._file, self._index_file, self._events_file):
+                f.close()
+            self._write_header(n_samples=self.samples_written, stop_time=time.time())
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Conversión de grabaciones (.npz → .json/.raw, cambio de codec).")
+    p.add_argument("src", help=".npz antiguo o grabación .json/.raw")
+    p.add_argument("dst", nargs="?", default=None, help="base de salida (por defecto junto a src)")
+    p.add_argument("--codec", choices=CODECS, default="int24")
+    p.add_argument("--scale", type=float, default=None,
+                   help=f"µV por unidad entera (por defecto LSB de Cyton, {CYTON_LSB_UV:.5f})")
+    args = p.parse_args(argv)
+
+    if args.src.endswith(".npz"):
+        base = convert_npz(args.src, args.dst, args.codec, args.scale)
+    else:
+        dst = args.dst or recording_base(args.src) + f"_{args.codec}"
+        base = transcode(args.src, dst, args.codec, args.scale)
+    _, raw_path = recording_paths(base)
+    print(f"[INFO] {raw_path}: {os.path.getsize(raw_path) / 1e6:.1f} MB ({args.codec})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
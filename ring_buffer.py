@@ -0,0 +1,105 @@
+# ring_buffer.py
+import threading
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Buffer circular 2D (canales × muestras) preasignado.
+
+    Cada muestra se escribe dos veces (en p y en p + capacity), de modo que
+    las últimas N muestras de todos los canales siempre forman un bloque
+    contiguo por fila: latest() devuelve una vista sin copias y extend()
+    cuesta O(chunk), no O(ventana).
+
+    - n_ch: número de canales (filas)
+    - capacity: muestras por canal que se conservan
+    - dtype: np.float32 o np.float64
+    """
+
+    def __init__(self, n_ch, capacity, dtype=np.float64):
+        self.n_ch = int(n_ch)
+        self.capacity = int(capacity)
+        self.dtype = np.dtype(dtype)
+        self._data = np.zeros((self.n_ch, 2 * self.capacity), dtype=self.dtype)
+        self._head = 0             # próxima posición de escritura [0, capacity)
+        self.total_written = 0     # muestras recibidas desde la creación
+
+    def __len__(self):
+        return self.capacity
+
+    def extend(self, chunk):
+        """
+        Añade un bloque (n_ch, k) de muestras nuevas.
+        Si k supera la capacidad solo se conservan las últimas `capacity`.
+        """
+        chunk = np.asarray(chunk, dtype=self.dtype)
+        k = chunk.shape[1]
+        if k == 0:
+            return
+        self.total_written += k
+        cap = self.capacity
+        if k > cap:
+            chunk = chunk[:, -cap:]
+            k = cap
+
+        first = min(k, cap - self._head)
+        h = self._head
+        self._data[:, h:h + first] = chunk[:, :first]
+        self._data[:, h + cap:h + cap + first] = chunk[:, :first]
+        rest = k - first
+        if rest:
+            self._data[:, :rest] = chunk[:, first:]
+            self._data[:, cap:cap + rest] = chunk[:, first:]
+        self._head = (h + k) % cap
+
+    def latest(self, n=None, copy=False):
+        """
+        Últimas n muestras de todos los canales, en orden temporal (n_ch, n).
+
+        Por defecto es una vista sin copia: deja de ser válida tras el
+        siguiente extend(). Con copy=True se hace una única copia contigua.
+        """
+        n = self.capacity if n is None else min(int(n), self.capacity)
+        end = self._head + self.capacity
+        view = self._data[:, end - n:end]
+        return np.array(view, copy=True) if copy else view
+
+    def snapshot(self, n=None):
+        """Devuelve (latest(n), total_written) (vista sin copia)."""
+        return self.latest(n), self.total_written
+
+    def clear(self):
+        """Vuelve a llenar el buffer con ceros y reinicia los contadores."""
+        self._data.fill(0)
+        self._head = 0
+        self.total_written = 0
+
+
+class ThreadSafeRingBuffer(RingBuffer):
+    """
+    RingBuffer protegido por un lock para un escritor (hilo de adquisición)
+    y lectores concurrentes (GUI). Las lecturas devuelven siempre copias,
+    ya que una vista podría ser sobrescrita por el escritor.
+    """
+
+    def __init__(self, n_ch, capacity, dtype=np.float64, lock=None):
+        super().__init__(n_ch, capacity, dtype=dtype)
+        self.lock = lock if lock is not None else threading.RLock()
+
+    def extend(self, chunk):
+        with self.lock:
+            super().extend(chunk)
+
+    def latest(self, n=None, copy=True):
+        with self.lock:
+            return super().latest(n, copy=True)
+
+    def snapshot(self, n=None):
+        """Devuelve (ventana copiada, total_written) de forma atómica."""
+        with self.lock:
+            return super().latest(n, copy=True), self.total_written
+
+    def clear(self):
+        with self.lock:
+            super().clear()
@@ -0,0 +1,96 @@
+# scheduler.py
+import math
+import time
+from contextlib import contextmanager
+
+
+class AdaptiveScheduler:
+    """
+    Planificador del análisis en tiempo real (sin Qt).
+
+    En lugar de calcular en cada disparo de un QTimer fijo, el análisis se
+    lanza cuando han llegado al menos `hop` muestras nuevas. Si el cómputo
+    tarda más que el tiempo que cubren esas muestras, el hop crece
+    (backpressure) hasta max_hop; cuando vuelve a haber margen, baja de
+    nuevo hasta min_new. Las muestras acumuladas durante un cómputo lento se
+    procesan juntas en el siguiente (coalescencia), nunca en cola.
+
+        if sched.due(buffer.total_written):
+            window, total = buffer.snapshot(n)
+            with sched.running(total):
+                frame = engine.process(window, total)
+
+    Contadores (ver stats()):
+      - ticks: llamadas a due()
+      - computes: cómputos lanzados
+      - idle_ticks: ticks sin muestras suficientes
+      - coalesced: hops fusionados en un único cómputo
+      - dropped_ticks: disparos del temporizador perdidos con el hilo ocupado
+      - hop: hop actual (muestras) y compute_ms: media móvil del cómputo
+    """
+
+    def __init__(self, fs, min_new, max_hop=None, poll_ms=10, headroom=1.5, alpha=0.2):
+        self.fs = fs
+        self.min_new = max(1, int(min_new))
+        self.max_hop = max(self.min_new, int(max_hop if max_hop is not None else fs))
+        self.poll_s = poll_ms / 1000.0
+        self.headroom = headroom
+        self.alpha = alpha
+        self.reset()
+
+    def reset(self, total_written=0):
+        self.hop = self.min_new
+        self.last_total = total_written
+        self.compute_ms = 0.0
+        self._last_tick = None
+
+        # Contadores
+        self.ticks = 0
+        self.computes = 0
+        self.idle_ticks = 0
+        self.coalesced = 0
+        self.dropped_ticks = 0
+
+    def due(self, total_written, now=None):
+        """True si hay al menos `hop` muestras nuevas desde el último cómputo."""
+        now = time.perf_counter() if now is None else now
+        self.ticks += 1
+        if self._last_tick is not None:
+            # Disparos que no llegaron a ejecutarse (Qt los fusiona si el hilo está ocupado)
+            self.dropped_ticks += max(0, int((now - self._last_tick) / self.poll_s + 0.5) - 1)
+        self._last_tick = now
+
+        new = total_written - self.last_total
+        if new < self.hop:
+            self.idle_ticks += 1
+            return False
+        self.coalesced += new // self.hop - 1
+        return True
+
+    @contextmanager
+    def running(self, total_written):
+        """Marca un cómputo sobre la ventana que termina en total_written y adapta el hop."""
+        self.last_total = total_written
+        t0 = time.perf_counter()
+        try:
+            yield self
+        finally:
+            ms = (time.perf_counter() - t0) * 1000.0
+            self.computes += 1
+            self.compute_ms = ms if self.computes == 1 else (
+                (1 - self.alpha) * self.compute_ms + self.alpha * ms)
+            # Hop mínimo que deja `headroom` de margen sobre el cómputo medio
+            needed = math.ceil(self.compute_ms / 1000.0 * self.headroom * self.fs)
+            self.hop = min(self.max_hop, max(self.min_new, needed))
+
+    def stats(self):
+        """Contadores del planificador como diccionario."""
+        return {
+            "ticks": self.ticks,
+            "computes": self.computes,
+            "idle_ticks": self.idle_ticks,
+            "coalesced": self.coalesced,
+            "dropped_ticks": self.dropped_ticks,
+            "hop": self.hop,
+            "compute_ms": self.compute_ms,
+        }
@@ -0,0 +1,36 @@
+# conftest.py
+import os
+import sys
+import numpy as np
+import pytest
+
+# Los módulos viven en la raíz del repositorio (sin paquete)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from recording import RecordingWriter
+
+
+def synthetic_eeg(n_ch, n, fs, seed=0):
+    """Ruido con offset DC, ritmo theta y algo de gamma (µV), reproducible."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(n) / fs
+    x = 20 * rng.standard_normal((n_ch, n)) + 500.0
+    x += 30 * np.sin(2 * np.pi * 6.0 * t + rng.uniform(0, 2 * np.pi, (n_ch, 1)))
+    x += 5 * np.sin(2 * np.pi * 40.0 * t + rng.uniform(0, 2 * np.pi, (n_ch, 1)))
+    return x
+
+
+@pytest.fixture
+def make_recording(tmp_path):
+    """
+    Escribe una grabación .json/.raw con RecordingWriter y devuelve
+    (ruta .json, muestras (N_CH, n)).
+    """
+    def make(name="session_test", fs=250, n_ch=4, seconds=20, chunk=25, seed=0, **meta):
+        x = synthetic_eeg(n_ch, int(seconds * fs), fs, seed)
+        writer = RecordingWriter(str(tmp_path / name), fs, n_ch, meta=meta)
+        for i in range(0, x.shape[1], chunk):
+            writer.append(x[:, i:i + chunk], board_ts=i / fs)
+        writer.close()
+        return str(tmp_path / (name + ".json")), x
+    return make
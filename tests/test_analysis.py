@@ -0,0 +1,92 @@
+# test_analysis.py
+import numpy as np
+import pytest
+
+from analysis import (analyze_recording, window_bounds, single_pass_band_powers,
+                      exact_band_powers, FeatureTimeline)
+from features import FeatureEngine
+from window_powers import get_window_powers
+from recording import open_recording
+
+FS, N_CH, WIN_SEC, HOP = 250, 4, 4, 20
+BANDS = ((4.0, 8.0), (30.0, 100.0))
+
+
+def test_window_bounds_end_on_hop_multiples():
+    starts, ends = window_bounds(1000, 250, 20)
+    assert ends[0] == 260 and ends[-1] == 1000 and np.all(ends % 20 == 0)
+    assert np.all(ends - starts == 250) and np.all(starts >= 0)
+    assert window_bounds(100, 250, 20)[1].size == 0
+
+
+@pytest.mark.parametrize("mode", ("butterworth", "wavelet"))
+def test_single_pass_matches_window_replay(make_recording, mode):
+    # Pasada única (segmentos cortos: varios segmentos y lotes) frente a la
+    # cadena repetida en cada ventana, en float64
+    path, _ = make_recording(n_ch=N_CH, seconds=24)
+    reader = open_recording(path)
+    win = WIN_SEC * FS
+    starts, _ = window_bounds(reader.n_samples, win, HOP)
+    powers = get_window_powers(FS, win, *BANDS, mode)
+    fast = single_pass_band_powers(reader, powers, starts, win, HOP, segment_s=7.0)
+    engine = FeatureEngine(FS, N_CH, WIN_SEC, *BANDS, mode=mode, sliding=False)
+    ref = exact_band_powers(reader, engine, starts, win, HOP)
+    for a, b in zip(fast, ref):
+        assert np.max(np.abs(a - b) / b) <= 1e-9
+
+
+@pytest.mark.parametrize("mode", ("butterworth", "wavelet"))
+def test_timeline_matches_tick_by_tick_engine(make_recording, mode):
+    # Ratio guardado (float32) frente a FeatureEngine.process en cada ventana: 6e-8
+    path, x = make_recording(n_ch=N_CH, seconds=12)
+    timeline = analyze_recording(path, hop_ms=HOP * 1000 / FS, win_sec=WIN_SEC, mode=mode)
+    assert timeline.params["method"] == "single-pass"
+    reader = open_recording(path)
+    engine = FeatureEngine(FS, N_CH, WIN_SEC, *BANDS, mode=mode, sliding=False)
+    win = WIN_SEC * FS
+    for i, t in enumerate(timeline.t):
+        end = int(round(t * FS))
+        frame = engine.process(reader.read(end - win, end), want_spec=False)
+        assert abs(timeline.ratio[i] - frame.ratio) <= 6e-8
+        assert np.max(np.abs(timeline.ratios[i] - frame.ratios)) <= 6e-8
+
+
+def test_exact_flag_replays_with_the_same_result(make_recording):
+    path, _ = make_recording(n_ch=2, seconds=10)
+    fast = analyze_recording(path, win_sec=WIN_SEC, mode="butterworth")
+    replay = analyze_recording(path, win_sec=WIN_SEC, mode="butterworth", exact=True)
+    assert replay.params["method"] == "replay"
+    assert np.max(np.abs(fast.ratios - replay.ratios)) <= 6e-8
+
+
+def test_timeline_save_load(make_recording, tmp_path):
+    path, _ = make_recording(n_ch=2, seconds=8)
+    timeline = analyze_recording(path, win_sec=WIN_SEC, mode="streaming")
+    loaded = FeatureTimeline.load(timeline.save(str(tmp_path / "t.features.npz")))
+    assert loaded.params == timeline.params
+    assert np.array_equal(loaded.ratio, timeline.ratio) and np.array_equal(loaded.t, timeline.t)
+    assert loaded.at(timeline.t[3]) == 3 and loaded.at(timeline.t[0] - 1e-3) == -1
+
+
+def test_playback_ticks_match_the_timeline(make_recording):
+    # Reproducción a 1x: chunks de un hop en el RingBuffer desde el inicio;
+    # cada tick con ventana completa coincide con su fila (redondeo float32: 3e-8)
+    from ring_buffer import RingBuffer
+    path, _ = make_recording(n_ch=N_CH, seconds=8)
+    timeline = analyze_recording(path, hop_ms=HOP * 1000 / FS, win_sec=WIN_SEC, mode="wavelet")
+    reader = open_recording(path)
+    win = WIN_SEC * FS
+    engine = FeatureEngine(FS, N_CH, WIN_SEC, *BANDS, mode="wavelet", sliding=False)
+    buffer = RingBuffer(N_CH, win)
+    checked = 0
+    for end in range(HOP, reader.n_samples + 1, HOP):
+        buffer.extend(reader.read(end - HOP, end))
+        if end < win:
+            continue
+        window, total_written = buffer.snapshot(win)
+        frame = engine.process(window, total_written, want_spec=False)
+        i = timeline.at(end / FS)
+        assert timeline.t[i] == end / FS
+        assert abs(timeline.ratio[i] - frame.ratio) <= 3e-8
+        checked += 1
+    assert checked == len(timeline)
@@ -0,0 +1,29 @@
+# test_batch.py
+import csv
+import numpy as np
+
+from batch import find_recordings, run_batch
+
+
+def test_find_recordings_counts_converted_sessions_once(make_recording, tmp_path):
+    path, x = make_recording(name="session_a", n_ch=2, seconds=2)
+    np.savez(str(tmp_path / "session_b.npz"), eeg=x, fs=250, channels=2)
+    make_recording(name="session_b", n_ch=2, seconds=2)   # .npz ya convertido
+    (tmp_path / "session_a.features.npz").write_bytes(b"")
+    found = find_recordings([str(tmp_path)])
+    assert found == [path, str(tmp_path / "session_b.npz")]
+
+
+def test_batch_writes_summary_and_resumes(make_recording, tmp_path):
+    make_recording(name="session_a", n_ch=2, seconds=10, win_sec=4)
+    make_recording(name="session_b", n_ch=2, seconds=12, win_sec=4, seed=1)
+    summary = str(tmp_path / "summary.csv")
+    assert run_batch([str(tmp_path)], summary, workers=1, cache_dir=None) == (2, 0, 0)
+    with open(summary, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [r["method"] for r in rows] == ["single-pass"] * 2
+    assert all(float(r["ratio_median"]) > 0 for r in rows)
+
+    # Reanudación: mismos parámetros → nada que hacer; --exact → se reprocesa
+    assert run_batch([str(tmp_path)], summary, workers=1, cache_dir=None) == (0, 2, 0)
+    assert run_batch([str(tmp_path)], summary, workers=1, exact=True, cache_dir=None) == (2, 0, 0)
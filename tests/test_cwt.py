@@ -0,0 +1,59 @@
+# test_cwt.py
+import numpy as np
+import pywt
+
+from cwt import MorletCWT, SlidingCWT, plan_frequency_grid
+from filters import CausalPreprocessor
+from conftest import synthetic_eeg
+
+FS = 250
+
+
+def test_morlet_cwt_matches_pywt():
+    x = synthetic_eeg(1, 2 * FS, FS)[0]
+    freqs = np.array([4.0, 8.0, 30.0, 100.0])
+    engine = MorletCWT(FS, x.size, freqs)
+    coeffs, _ = pywt.cwt(x, engine.scales, 'cmor1.5-1.0', sampling_period=1 / FS)
+    ref = np.abs(coeffs) ** 2 / engine.scales[:, None]
+    assert np.max(np.abs(engine.power(x) - ref)) <= 1e-9 * ref.max()
+
+
+def test_frequency_grid_covers_bands():
+    freqs, masks = plan_frequency_grid(FS, {'theta': (4.0, 8.0), 'gamma': (30.0, 100.0)})
+    assert freqs[masks['theta']].min() == 4.0 and freqs[masks['theta']].max() == 8.0
+    assert freqs[masks['gamma']].max() <= 0.9 * FS / 2
+
+
+def test_sliding_cwt_matches_full_cwt_of_causal_input():
+    # Columnas interiores: ≈6e-5 del máximo con esta señal; la cota es la
+    # tolerancia de truncado de los núcleos (tol=1e-4)
+    n_ch, win, hop = 2, 5 * FS, 20
+    x = synthetic_eeg(n_ch, 15 * FS, FS)
+    freqs, _ = plan_frequency_grid(FS, {'spec': (1.0, 100.0)}, n_per_band=40, spacing='linear')
+    sliding = SlidingCWT(FS, win, freqs)
+    pre = CausalPreprocessor(n_ch, FS, win)
+    for end in range(win, x.shape[1] + 1, hop):
+        raw = pre.update(x[:, end - win:end], end)
+        power = sliding.update(raw, end, key='all')
+    full = sliding.engine.power(raw)
+    edge = FS   # los bordes dependen de muestras fuera de la ventana
+    err = np.abs(power - full)[..., edge:-edge].max()
+    assert err <= 1e-4 * full.max()
+
+
+def test_engine_sliding_spectrogram_is_causal_in_every_mode():
+    from features import FeatureEngine
+    n_ch, win_sec, hop = 3, 4, 25
+    win = win_sec * FS
+    x = synthetic_eeg(n_ch, 12 * FS, FS)
+    for mode in ('butterworth', 'wavelet'):
+        engine = FeatureEngine(FS, n_ch, win_sec, (4.0, 8.0), (30.0, 100.0), mode=mode, sliding=True)
+        # Bandas por CWT incremental solo en modo wavelet
+        assert any(k != 'spec' for k in engine.cwt) == (mode == 'wavelet')
+        pre = CausalPreprocessor(n_ch, FS, win)
+        for end in range(win, x.shape[1] + 1, hop):
+            frame = engine.process(x[:, end - win:end], end, ch_sel=1)
+            raw = pre.update(x[:, end - win:end], end)
+        full = engine.cwt['spec'].engine.power(raw[1:2])[0]
+        err = np.abs(frame.spec - full)[:, FS:-FS].max()
+        assert err <= 1e-4 * full.max(), mode
@@ -0,0 +1,48 @@
+# test_feature_cache.py
+import os
+import numpy as np
+
+from analysis import analyze_recording
+from feature_cache import FeatureCache, CODE_MODULES
+
+
+def test_code_version_covers_the_analysis_modules():
+    for name in ("filters", "cwt", "features", "window_powers", "analysis"):
+        assert name in CODE_MODULES
+
+
+def test_hit_miss_and_invalidation(make_recording, tmp_path):
+    path, _ = make_recording(n_ch=2, seconds=8)
+    cache = FeatureCache(str(tmp_path / "cache"))
+    first = analyze_recording(path, win_sec=4, mode="butterworth", cache=cache)
+    again = analyze_recording(path, win_sec=4, mode="butterworth", cache=cache)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert np.array_equal(first.ratio, again.ratio) and again.params == first.params
+
+    # Otros parámetros u otro método: otra entrada
+    analyze_recording(path, hop_ms=40, win_sec=4, mode="butterworth", cache=cache)
+    analyze_recording(path, win_sec=4, mode="butterworth", exact=True, cache=cache)
+    assert cache.hits == 1 and cache.stats()["entries"] == 3
+
+    # Cambiar las muestras invalida la entrada aunque la ruta sea la misma
+    with open(path.replace(".json", ".raw"), "r+b") as f:
+        f.write(b"\x00" * 8)
+    analyze_recording(path, win_sec=4, mode="butterworth", cache=cache)
+    assert cache.hits == 1 and cache.stats()["entries"] == 4
+
+
+def test_evicts_least_recently_used(make_recording, tmp_path):
+    path, _ = make_recording(n_ch=2, seconds=8)
+    cache = FeatureCache(str(tmp_path / "cache"))
+    keys = []
+    for i, hop_ms in enumerate((40, 80, 120)):
+        timeline = analyze_recording(path, hop_ms=hop_ms, win_sec=4, mode="streaming")
+        keys.append(f"k{i}")
+        cache.put(keys[-1], timeline)
+        os.utime(cache.path(keys[-1]), (1000 + i, 1000 + i))
+    cache.get("k0")   # un acierto la marca como la más reciente
+    sizes = {k: os.path.getsize(cache.path(k)) for k in keys}
+    cache.max_bytes = sizes["k0"] + sizes["k2"]
+    assert cache.evict() == 1
+    assert [os.path.exists(cache.path(k)) for k in keys] == [True, False, True]
+    assert cache.get("k1") is None and cache.misses == 1
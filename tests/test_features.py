@@ -0,0 +1,48 @@
+# test_features.py
+import numpy as np
+import pytest
+
+from features import FeatureEngine, channel_blocks, MODES
+from conftest import synthetic_eeg
+
+FS, N_CH, WIN_SEC, HOP = 250, 8, 4, 20
+BANDS = ((4.0, 8.0), (30.0, 100.0))
+
+
+def test_channel_blocks_cover_all_channels():
+    for n_blocks in (1, 2, 3, 4, 8, 16):
+        blocks = channel_blocks(N_CH, n_blocks)
+        assert np.concatenate([np.arange(N_CH)[b] for b in blocks]).tolist() == list(range(N_CH))
+
+
+def run_ticks(mode, n_workers, sliding):
+    win = WIN_SEC * FS
+    x = synthetic_eeg(N_CH, win + 10 * HOP, FS, seed=3)
+    engine = FeatureEngine(FS, N_CH, WIN_SEC, *BANDS, mode=mode, sliding=sliding, n_workers=n_workers)
+    frames = [engine.process(x[:, end - win:end], end, ch_sel=2)
+              for end in range(win, x.shape[1] + 1, HOP)]
+    engine.close()
+    return frames
+
+
+@pytest.mark.parametrize("mode", MODES)
+@pytest.mark.parametrize("sliding", (False, True))
+def test_workers_are_bit_identical(mode, sliding):
+    # Los bloques de canales son independientes: 1, 2 y 4 hilos dan lo mismo bit a bit
+    ref = run_ticks(mode, 1, sliding)
+    for n_workers in (2, 4):
+        for a, b in zip(ref, run_ticks(mode, n_workers, sliding)):
+            assert np.array_equal(a.ratios, b.ratios)
+            assert np.array_equal(a.theta_pows, b.theta_pows)
+            assert np.array_equal(a.gamma_pows, b.gamma_pows)
+            assert np.array_equal(a.spec, b.spec)
+
+
+def test_band_powers_match_process():
+    win = WIN_SEC * FS
+    x = synthetic_eeg(N_CH, win, FS)
+    for mode in ("butterworth", "wavelet"):
+        engine = FeatureEngine(FS, N_CH, WIN_SEC, *BANDS, mode=mode, sliding=False)
+        theta, gamma = engine.band_powers(x)
+        frame = engine.process(x, want_spec=False)
+        assert np.array_equal(theta, frame.theta_pows) and np.array_equal(gamma, frame.gamma_pows)
@@ -0,0 +1,163 @@
+# test_recording.py
+import threading
+import numpy as np
+
+from recording import RecordingWriter, open_recording, read_header, INDEX_DTYPE
+
+
+def test_writer_round_trip(make_recording):
+    path, x = make_recording(n_ch=3, seconds=4, mode="wavelet")
+    header = read_header(path)
+    assert header["n_samples"] == x.shape[1] and header["mode"] == "wavelet"
+    assert np.allclose(open_recording(path).read(0, x.shape[1]), x.astype(np.float32))
+
+
+def blocked_writer(tmp_path, max_chunks=4):
+    # Escritor detenido dentro de una escritura hasta que se abre `gate`
+    writer = RecordingWriter(str(tmp_path / "stuck"), 250, 2, max_chunks=max_chunks)
+    gate, inside = threading.Event(), threading.Event()
+    write = writer._write_items
+
+    def slow(items):
+        inside.set()
+        gate.wait()
+        write(items)
+    writer._write_items = slow
+    writer.append(np.zeros((2, 25)))
+    inside.wait(5)
+    return writer, gate
+
+
+def test_full_queue_counts_dropped_chunks_and_events(tmp_path):
+    writer, gate = blocked_writer(tmp_path)
+    accepted = [writer.append(np.ones((2, 25))) for _ in range(6)]
+    marked = [writer.mark(f"e{i}") for i in range(2)]
+    assert accepted == [True] * 4 + [False] * 2 and marked == [False, False]
+    stats = writer.stats()
+    assert stats["dropped_chunks"] == 2 and stats["dropped_events"] == 2
+    gate.set()
+    writer.close()
+    assert writer.stats()["samples_written"] == 5 * 25
+
+
+def test_close_with_stuck_writer_still_writes_n_samples(tmp_path):
+    writer, gate = blocked_writer(tmp_path)
+    for _ in range(4):
+        writer.append(np.ones((2, 25)))
+    writer.mark("lost")
+    writer.close(timeout=0.1)   # cola llena y escritor ocupado: no debe lanzar queue.Full
+    path = str(tmp_path / "stuck.json")
+    assert "n_samples" in read_header(path)
+    assert writer.stats()["dropped_chunks"] >= 1
+    # Al terminar, el propio hilo completa la cabecera con lo escrito
+    gate.set()
+    writer._thread.join(5)
+    header = read_header(path)
+    assert header["n_samples"] == writer.samples_written == open_recording(path).n_samples
+
+
+def test_reader_reads_clamped_ranges_and_windows(make_recording):
+    path, x = make_recording(n_ch=2, seconds=2)
+    reader = open_recording(path)
+    x32 = x.astype(np.float32).astype(np.float64)
+    assert reader.n_samples == x.shape[1] and reader.duration == 2.0
+    assert np.array_equal(reader.read(100, 200), x32[:, 100:200])
+    # Fuera de rango: se recorta a la grabación (ventanas antes del inicio o tras el final)
+    assert np.array_equal(reader.read(-50, 10), x32[:, :10])
+    assert reader.read(x.shape[1] + 5, x.shape[1] + 10).shape == (2, 0)
+    ends = [end for end, win in reader.windows(250, 100)]
+    assert ends == list(range(250, x.shape[1] + 1, 100))
+
+
+def test_reader_refresh_sees_samples_appended_later(tmp_path):
+    writer = RecordingWriter(str(tmp_path / "live"), 250, 2)
+    writer.append(np.ones((2, 50)))
+    writer.close()   # vacía la cola; se reabre el .raw en modo append como un escritor en curso
+    reader = open_recording(str(tmp_path / "live.json"))
+    assert reader.n_samples == 50
+    with open(reader.raw_path, "ab") as f:
+        f.write(reader.codec.encode(np.full((30, 2), 2.0)))
+    assert reader.refresh() == 80 and reader.read(50, 80).mean() == 2.0
+
+
+def test_npz_is_converted_once(tmp_path):
+    eeg = np.arange(3 * 400, dtype=np.float64).reshape(3, 400)
+    npz = str(tmp_path / "session_old.npz")
+    np.savez_compressed(npz, eeg=eeg, fs=250, channels=3, mode="butterworth", win_sec=10)
+    reader = open_recording(npz)
+    assert reader.meta["converted_from"] == "session_old.npz" and reader.meta["mode"] == "butterworth"
+    assert np.array_equal(reader.read(0, 400), eeg)
+    mtime = (tmp_path / "session_old.raw").stat().st_mtime_ns
+    open_recording(npz)
+    assert (tmp_path / "session_old.raw").stat().st_mtime_ns == mtime
+
+
+def test_index_and_events_locate_samples(tmp_path):
+    fs = 250
+    writer = RecordingWriter(str(tmp_path / "indexed"), fs, 1, index_interval_s=1.0)
+    t0 = 1000.0
+    for i in range(0, 5 * fs, 50):
+        writer.append(np.zeros((1, 50)), board_ts=t0 + i / fs)
+        if i == 2 * fs:
+            writer.mark("inicio")
+    writer.close()
+    reader = open_recording(str(tmp_path / "indexed.json"))
+
+    # Una entrada por segundo (la primera en la muestra 0)
+    assert reader.index["sample"].tolist() == [0, 250, 500, 750, 1000]
+    assert np.allclose(reader.board_time([0, 125, 1100]), t0 + np.array([0, 125, 1100]) / fs)
+    # El marcador queda en la posición de escritura en que llegó (tras el chunk de 2 s)
+    assert [(e["sample"], e["label"]) for e in reader.events] == [(2 * fs + 50, "inicio")]
+
+
+def test_wall_time_conversions_follow_the_index(tmp_path):
+    fs = 250
+    writer = RecordingWriter(str(tmp_path / "wall"), fs, 1)
+    writer.append(np.zeros((1, 4 * fs)))
+    writer.close()
+    # Índice con una pausa de 10 s de reloj entre las muestras 500 y 750
+    index = np.array([(0, np.nan, 100.0), (500, np.nan, 102.0), (750, np.nan, 113.0)], dtype=INDEX_DTYPE)
+    index.tofile(str(tmp_path / "wall.idx"))
+    reader = open_recording(str(tmp_path / "wall.json"))
+    assert np.allclose(reader.wall_time([0, 250, 600, 800]), [100.0, 101.0, 102.4, 113.2])
+    assert reader.sample_at_wall(102.4) == 600 and reader.sample_at_wall(113.2) == 800
+    assert reader.sample_at_wall(50.0) == 0 and reader.sample_at_wall(1e9) == reader.n_samples
+
+
+def test_truncated_event_line_is_ignored(tmp_path):
+    writer = RecordingWriter(str(tmp_path / "ev"), 250, 1)
+    writer.append(np.zeros((1, 10)))
+    writer.mark("a")
+    writer.close()
+    with open(str(tmp_path / "ev.events.jsonl"), "a") as f:
+        f.write('{"sample": 10, "wa')
+    assert [e["label"] for e in open_recording(str(tmp_path / "ev.json")).events] == ["a"]
+
+
+def test_codecs_round_trip_to_adc_resolution():
+    from recording import SampleCodec, CODECS, CYTON_LSB_UV
+    rng = np.random.default_rng(5)
+    block = np.asfortranarray(rng.normal(0, 2000, (300, 4)))   # bloques transpuestos (vista .T)
+    block[0] = [-2 ** 23 * CYTON_LSB_UV, (2 ** 23 - 1) * CYTON_LSB_UV, 0.0, -CYTON_LSB_UV]
+    for name in CODECS:
+        codec = SampleCodec(name, 4)
+        data = codec.encode(block)
+        assert len(data) == block.shape[0] * codec.sample_bytes
+        stored = np.frombuffer(data, dtype=codec._dtype).reshape((-1, 4) + codec._tail)
+        decoded = codec.decode(stored)
+        tol = 1e-7 * np.abs(block).max() if name == "float32" else CYTON_LSB_UV / 2 + 1e-12
+        assert np.max(np.abs(decoded - block)) <= tol, name
+        # El rango completo del ADC de 24 bits se conserva sin saturar
+        assert np.allclose(decoded[0], block[0], atol=tol), name
+
+
+def test_transcode_keeps_samples_index_and_events(make_recording, tmp_path):
+    from recording import transcode, CYTON_LSB_UV
+    path, x = make_recording(n_ch=2, seconds=3)
+    src = open_recording(path)
+    base = transcode(path, str(tmp_path / "session_int24"), "int24")
+    dst = open_recording(base)
+    assert dst.codec.name == "int24" and read_header(base)["n_samples"] == src.n_samples
+    assert np.max(np.abs(dst.read(0, dst.n_samples) - src.read(0, src.n_samples))) <= CYTON_LSB_UV / 2 + 1e-9
+    assert np.array_equal(dst.index, src.index) and dst.events == src.events
+    assert dst.stored.nbytes == src.stored.nbytes * 3 // 4
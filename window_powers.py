@@ -0,0 +1,236 @@
+# window_powers.py
+"""
+Potencias θ/γ de muchas ventanas solapadas en una sola pasada, con la
+misma definición por ventana que FeatureEngine.band_powers (preprocesado
+y filtrado de fase cero repetidos en cada ventana), sin repetirlos.
+
+La cadena aplicada a una ventana y la misma cadena aplicada una vez a un
+segmento que la contiene solo difieren, dentro de la ventana, por los
+estados de los filtros en sus bordes. Esa diferencia es una combinación
+de los modos propios de los filtros (z**k desde el borde izquierdo y
+z**(n-1-k) desde el derecho, por cada polo z), así que vive en un
+subespacio fijo de dimensión 2·(nº de polos) con base ortonormal Q:
+
+    cadena(ventana) = cadena(segmento)[ventana] + Q·d
+
+Con eso la potencia de cada ventana sale de productos escalares de la
+ventana de entrada y de la salida del segmento contra unos pocos núcleos
+fijos (una multiplicación de matrices por lote de ventanas):
+
+  - butterworth: media|Hilbert(y)|² = (2·Σy² − (Σy)²/n − (Σ(−1)ᵏy)²/n) / n
+    (identidad exacta de la FFT de scipy.signal.hilbert; el último término
+    solo con n par), con Σy² = Σy_seg² − |Qᵀy_seg|² + |QᵀF·x|² y F la
+    cadena sobre la ventana.
+  - wavelet: el preprocesado se corrige igual y la energía CWT de cada
+    banda es una forma cuadrática fija de la ventana preprocesada:
+    Parseval con los espectros de los núcleos, menos lo que la convolución
+    vierte fuera de la ventana, que solo depende de sus primeras y últimas
+    muestras (bloques de esquina).
+
+El resultado coincide con la repetición ventana a ventana hasta el
+redondeo (≲1e-10 relativo), con un coste por ventana proporcional a su
+largo y no al de la cadena completa.
+"""
+from functools import lru_cache
+import numpy as np
+from scipy.fft import rfft, next_fast_len
+
+from filters import (bandpass_sos, preprocess_signal, bandpass_gain_factor,
+                     preprocess_poles, bandpass_poles)
+from cwt import get_cwt_engine, plan_frequency_grid
+
+# Máximo de operadores (modo, fs, n, bandas) distintos en caché
+OPERATOR_CACHE_SIZE = 4
+# Autovalores de los bloques de esquina (CWT) que se descartan, relativos al mayor
+SPILL_RTOL = 1e-10
+
+
+def edge_basis(poles, n):
+    """
+    Base ortonormal (n, 2·len(poles)) de los modos propios de una cadena de
+    filtros en una ventana de n muestras: z**k desde el borde izquierdo y
+    z**(n-1-k) desde el derecho, partes real e imaginaria de cada par.
+    """
+    k = np.arange(n)
+    cols = []
+    for z in poles:
+        if z.imag < 0:
+            continue   # el conjugado genera el mismo subespacio real
+        for mode in (z ** k, z ** (n - 1 - k)):
+            cols.append(mode.real)
+            if z.imag > 0:
+                cols.append(mode.imag)
+    q, _ = np.linalg.qr(np.array(cols).T)
+    return q
+
+
+def _windows(x, n, hop):
+    # Vistas (N_CH, n_win, n) de las ventanas que caben en x, sin copiar
+    return np.lib.stride_tricks.sliding_window_view(x, n, axis=-1)[:, ::hop]
+
+
+class WindowBandPowers:
+    """
+    Potencias θ/γ de todas las ventanas de `n` muestras cada `hop` de un
+    segmento (batch), igual que FeatureEngine(...).band_powers sobre cada
+    una. Los operadores se precalculan una vez por (modo, fs, n, bandas);
+    usar get_window_powers para compartirlos.
+    """
+
+    def __init__(self, fs, n, theta_band, gamma_band, mode='butterworth'):
+        if mode not in ('butterworth', 'wavelet'):
+            raise ValueError(f"Modo sin definición por ventana: {mode}")
+        self.fs = fs
+        self.n = int(n)
+        self.mode = mode
+        self.bands = {'theta': tuple(theta_band), 'gamma': tuple(gamma_band)}
+        if mode == 'butterworth':
+            self._init_butterworth()
+        else:
+            self._init_wavelet()
+
+    # ---- butterworth ----
+    def _chain(self, x, band):
+        # Misma cadena que FeatureEngine en modo butterworth
+        low, high = band
+        raw = preprocess_signal(x, fs=self.fs)
+        return bandpass_sos(raw, low, high, fs=self.fs) / bandpass_gain_factor(low, high, fs=self.fs)
+
+    def _init_butterworth(self):
+        n = self.n
+        eye = np.eye(n)
+        ones = np.ones(n)
+        # (-1)**k: bin de Nyquist de la FFT de Hilbert (solo existe con n par)
+        alt = (-1.0) ** np.arange(n) if n % 2 == 0 else np.zeros(n)
+        self.basis, kernels = {}, []
+        for name, band in self.bands.items():
+            q = edge_basis(np.concatenate((preprocess_poles(self.fs),
+                                           bandpass_poles(*band, fs=self.fs))), n)
+            # Filas de la cadena sobre impulsos = Fᵀ; núcleos Fᵀ·[Q, 1, (-1)**k]
+            ft = self._chain(eye, band)
+            self.basis[name] = q
+            kernels.append(ft @ np.column_stack((q, ones, alt)))
+        # Núcleos de ambas bandas juntos: una sola multiplicación por lote
+        self.kernels = np.hstack(kernels)
+        self.split = np.cumsum([k.shape[1] for k in kernels])[:-1]
+        self.row_bytes = 8 * n
+
+    def _butterworth(self, x, hop):
+        n = self.n
+        proj = np.split(_windows(x, n, hop) @ self.kernels, self.split, axis=-1)
+        starts = np.arange(proj[0].shape[1]) * hop
+        out = {}
+        for (name, band), proj_x in zip(self.bands.items(), proj):
+            y = self._chain(x, band)
+            q = self.basis[name]
+            r = q.shape[1]
+            cum = np.concatenate((np.zeros((y.shape[0], 1)), np.cumsum(y ** 2, axis=1)), axis=1)
+            proj_y = _windows(y, n, hop) @ q
+            s2 = (cum[:, starts + n] - cum[:, starts]
+                  - np.sum(proj_y ** 2, axis=-1) + np.sum(proj_x[..., :r] ** 2, axis=-1))
+            s1, s_alt = proj_x[..., r], proj_x[..., r + 1]
+            out[name] = (2 * s2 - (s1 ** 2 + s_alt ** 2) / n) / n
+        return out
+
+    # ---- wavelet ----
+    def _init_wavelet(self):
+        n, fs = self.n, self.fs
+        self.band_freqs, self.band_masks = plan_frequency_grid(fs, self.bands)
+        cwt = get_cwt_engine(fs, n, self.band_freqs)
+        # Sin solape circular entre la ventana y lo que la convolución vierte fuera
+        self.nfft = next_fast_len(n + max(k.size for k in cwt.kernels) - 1, real=True)
+
+        # Corrección del preprocesado por ventana
+        self.basis_pre = edge_basis(preprocess_poles(fs), n)
+        self.kernels_pre = preprocess_signal(np.eye(n), fs=fs) @ self.basis_pre
+
+        # Alcance de los núcleos fuera de la ventana (izquierda / derecha)
+        reach_l = max(cwt.starts)
+        reach_r = max(k.size - 1 - s for k, s in zip(cwt.kernels, cwt.starts))
+        self.edge = min(n, max(reach_l, reach_r))
+        h = self.edge
+
+        # Parseval: pesos por bin de la rFFT (espectro plegado, señal real) y
+        # bloques de esquina con la energía vertida fuera de la ventana
+        half = self.nfft // 2 + 1
+        m = (self.nfft - 1) // 2
+        self.weights = np.empty((half, 2))
+        spill_l, spill_r = [], []
+        for col, (name, mask) in enumerate(self.band_masks.items()):
+            norm = n * mask.sum()
+            w = np.zeros(self.nfft)
+            e_l, e_r = np.zeros((h, h)), np.zeros((h, h))
+            for f in np.flatnonzero(mask):
+                k, start, scale = cwt.kernels[f], cwt.starts[f], cwt.scales[f] + 1e-18
+                w += np.abs(np.fft.fft(k, self.nfft)) ** 2 / scale
+                # Salida completa m' = j + i con j la muestra e i el índice del
+                # núcleo; la ventana de salida es m' ∈ [start, start + n)
+                left = self._spill(k, np.arange(start), np.arange(h))
+                right = self._spill(k, np.arange(start + n, n + k.size - 1), np.arange(n - h, n))
+                e_l += (left.conj().T @ left).real / scale
+                e_r += (right.conj().T @ right).real / scale
+            w /= norm * self.nfft
+            self.weights[:, col] = w[:half]
+            self.weights[1:m + 1, col] += w[self.nfft - m:][::-1]
+            spill_l.append(self._factor(e_l / norm))
+            spill_r.append(self._factor(e_r / norm))
+        # Mismo peso para la parte real y la imaginaria de cada bin (vista float)
+        self.weights = np.repeat(self.weights, 2, axis=0)
+
+        # Factores de todas las bandas juntos: una multiplicación por esquina
+        self.spill_split = np.cumsum([f.shape[1] for f in spill_l])[:-1], \
+            np.cumsum([f.shape[1] for f in spill_r])[:-1]
+        self.spill_l, self.spill_r = np.hstack(spill_l), np.hstack(spill_r)
+        self.row_bytes = 8 * n + 16 * half
+
+    @staticmethod
+    def _spill(kernel, outputs, samples):
+        # Matriz (salidas, muestras) de la convolución completa: kernel[m' - j]
+        idx = outputs[:, None] - samples[None, :]
+        valid = (idx >= 0) & (idx < kernel.size)
+        return np.where(valid, kernel[np.clip(idx, 0, kernel.size - 1)], 0)
+
+    @staticmethod
+    def _factor(e):
+        # e = V·diag(λ)·Vᵀ (semidefinida) → V·sqrt(λ) sin los modos despreciables
+        lam, vec = np.linalg.eigh(e)
+        keep = lam > SPILL_RTOL * max(lam.max(), 1e-300)
+        return vec[:, keep] * np.sqrt(lam[keep])
+
+    def _wavelet(self, x, hop):
+        n, h = self.n, self.edge
+        raw_seg = preprocess_signal(x, fs=self.fs)
+        rv = _windows(raw_seg, n, hop)
+        # Ventanas preprocesadas por separado: segmento + corrección de bordes
+        d = _windows(x, n, hop) @ self.kernels_pre - rv @ self.basis_pre
+        raw = rv + d @ self.basis_pre.T
+        spec = rfft(raw, self.nfft, axis=-1).view(np.float64)
+        spec *= spec
+        energy = spec @ self.weights
+        spill = []
+        for part, factor, split in ((raw[..., :h], self.spill_l, self.spill_split[0]),
+                                    (raw[..., n - h:], self.spill_r, self.spill_split[1])):
+            proj = part @ factor
+            spill.append([np.sum(p ** 2, axis=-1) for p in np.split(proj, split, axis=-1)])
+        return {name: energy[..., col] - spill[0][col] - spill[1][col]
+                for col, name in enumerate(self.band_masks)}
+
+    def batch(self, x, hop):
+        """
+        x: segmento (N_CH, k). Ventanas que empiezan en 0, hop, 2·hop, ...
+        mientras caben en x. Devuelve (theta, gamma), cada uno (n_win, N_CH).
+        """
+        x = np.asarray(x, dtype=np.float64)
+        out = self._butterworth(x, hop) if self.mode == 'butterworth' else self._wavelet(x, hop)
+        return out['theta'].T, out['gamma'].T
+
+
+@lru_cache(maxsize=OPERATOR_CACHE_SIZE)
+def _cached_powers(fs, n, theta_band, gamma_band, mode):
+    return WindowBandPowers(fs, n, theta_band, gamma_band, mode)
+
+
+def get_window_powers(fs, n, theta_band, gamma_band, mode='butterworth'):
+    """Devuelve el WindowBandPowers cacheado para (fs, n, bandas, modo)."""
+    return _cached_powers(fs, int(n), tuple(map(float, theta_band)),
+                          tuple(map(float, gamma_band)), mode)